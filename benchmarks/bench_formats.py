@@ -0,0 +1,99 @@
+"""Форматы файлов данных: время записи и чтения и размер на диске.
+
+Большой файл портфелей и история курсов одним документом пишутся каждым
+доступным сериализатором; compact/json без orjson замеряются отдельной строкой.
+Запуск: python benchmarks/bench_formats.py [--users 200000] [--history 500000]
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import datagen
+
+datagen.use_data_path()
+
+from infra import serializers  # noqa: E402
+from infra.database import JsonBackend  # noqa: E402
+
+
+@contextmanager
+def stdlib_json():
+    """Временно отключает orjson, чтобы замерить запасной путь на стандартном json"""
+    saved = serializers.fast_json()
+    serializers.orjson = None
+    try:
+        yield
+    finally:
+        serializers.orjson = saved
+
+
+def portfolios(n_users: int, rnd: random.Random) -> list[dict]:
+    codes = [datagen.BASE, *datagen.RATES][:4]
+    return [{"user_id": i,
+             "wallets": {code: {"balance": round(rnd.uniform(1, 1000), 4), "version": rnd.randint(0, 50)}
+                         for code in codes}}
+            for i in range(1, n_users + 1)]
+
+
+def measure(backend: JsonBackend, path: Path, data, serializer, repeat: int) -> tuple[float, float, int]:
+    """Медианы записи и чтения в миллисекундах и размер файла"""
+    saves, loads = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        backend.save(path, data, serializer)
+        saves.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        backend.load(path)
+        loads.append(time.perf_counter() - start)
+    return statistics.median(saves) * 1e3, statistics.median(loads) * 1e3, path.stat().st_size
+
+
+def variants():
+    """(подпись, сериализатор, отключать ли orjson) для всех доступных форматов"""
+    for name in serializers.SERIALIZERS:
+        try:
+            serializer = serializers.get_serializer(name)
+        except ValueError as e:
+            print(f"{name}: пропущен ({e})")
+            continue
+        if name != "msgpack" and serializers.fast_json() is not None:
+            yield f"{name} (stdlib)", serializer, True
+            yield f"{name} (orjson)", serializer, False
+        else:
+            yield name, serializer, False
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200_000)
+    parser.add_argument("--history", type=int, default=500_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rnd = random.Random(42)
+    datasets = {
+        f"портфели ({args.users:,} польз.)": portfolios(args.users, rnd),
+        f"история ({args.history:,} точек)": list(datagen.history_rows(args.history, datetime(2025, 1, 1), rnd)),
+    }
+    backend = JsonBackend("json")
+    workdir = Path(tempfile.mkdtemp(prefix="valutatrade_formats_"))
+    for title, data in datasets.items():
+        print(f"\n{title}")
+        print(f"{'формат':>18} | {'запись, мс':>10} | {'чтение, мс':>10} | {'размер, МБ':>10}")
+        for label, serializer, use_stdlib in variants():
+            path = workdir / "data.json"
+            if use_stdlib:
+                with stdlib_json():
+                    save_ms, load_ms, size = measure(backend, path, data, serializer, args.repeat)
+            else:
+                save_ms, load_ms, size = measure(backend, path, data, serializer, args.repeat)
+            print(f"{label:>18} | {save_ms:>10.1f} | {load_ms:>10.1f} | {size / 2**20:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
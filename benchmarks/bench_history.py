@@ -0,0 +1,75 @@
+"""Запрос истории курса: время и пиковая память при росте истории.
+
+Сравниваются потоковое чтение (RatesStorage.history) и прежнее чтение
+партиций целиком со списком в памяти. Память — пик tracemalloc за запрос.
+Запуск: python benchmarks/bench_history.py [--sizes 200000,1000000] [--days 30]
+"""
+import argparse
+import shutil
+import time
+import tracemalloc
+from collections import deque
+from datetime import datetime, timedelta
+
+import datagen
+
+datagen.use_data_path()
+
+from constants import EXCHANGE_RATE_FILE, HISTORY_DIR, RATES_FILE  # noqa: E402
+from infra.database import read_json_lines  # noqa: E402
+from parser_service.storage import RatesStorage, downsample  # noqa: E402
+
+PAIR = "BTC_USD"
+
+
+def whole_partitions(storage: RatesStorage, start: datetime, end: datetime) -> list[dict]:
+    """Прежний способ: партиции месяцев читаются целиком, затем фильтр и сортировка"""
+    lo, hi = start.isoformat(timespec="seconds"), end.isoformat(timespec="seconds")
+    points = []
+    for month in storage.history_store._months(start, end):
+        rows, _ = read_json_lines(HISTORY_DIR / PAIR / f"{month}.jsonl")
+        points.extend(r for r in rows if lo <= r["timestamp"] <= hi)
+    points.sort(key=lambda r: r["timestamp"])
+    return points
+
+
+def measure(func) -> tuple[float, float]:
+    """Время (мс) и пик памяти (МБ) одного полного прохода по результату"""
+    start = time.perf_counter()
+    deque(func(), maxlen=0)
+    elapsed = (time.perf_counter() - start) * 1e3
+    tracemalloc.start()
+    deque(func(), maxlen=0)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="200000,1000000")
+    parser.add_argument("--days", type=int, default=30)
+    args = parser.parse_args()
+
+    storage = None
+    print(f"{'точек':>9} | {'запрос':>22} | {'время, мс':>9} | {'пик памяти, МБ':>14}")
+    for size in (int(x) for x in args.sizes.split(",")):
+        # новая история с нуля: дозапись к прежней нарушила бы порядок времени в партициях
+        shutil.rmtree(HISTORY_DIR, ignore_errors=True)
+        info = datagen.generate(users=1, wallets=1, history=size)
+        storage = storage or RatesStorage(RATES_FILE, EXCHANGE_RATE_FILE, HISTORY_DIR)
+        end = datetime.now()
+        start = end - timedelta(days=args.days)
+        cases = {
+            "партиции целиком": lambda: whole_partitions(storage, start, end),
+            "потоком": lambda: storage.history(PAIR, start, end),
+            "целиком + бары 1ч": lambda: downsample(whole_partitions(storage, start, end), 3600),
+            "потоком + бары 1ч": lambda: storage.history(PAIR, start, end, 3600),
+        }
+        for title, func in cases.items():
+            elapsed, peak = measure(func)
+            print(f"{info['history']:>9} | {title:>22} | {elapsed:>9.1f} | {peak:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
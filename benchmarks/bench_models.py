@@ -0,0 +1,89 @@
+"""Доменные модели: время и память на миллион кошельков.
+
+Прежняя модель (экземпляр со словарём атрибутов и проверкой в сеттере)
+сравнивается с __slots__-моделью: обычный конструктор с проверками,
+Wallet.from_trusted и Portfolio.from_record для записей из хранилища,
+пакетный Portfolio.from_records, а также матрица int64 (Portfolio.units_matrix),
+которой пользуется valuation_report.
+Запуск: python benchmarks/bench_models.py [--wallets 1000000] [--per-user 4] [--repeat 3]
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+import datagen
+
+datagen.use_data_path()
+
+from core.models import Portfolio, Wallet  # noqa: E402
+
+
+class DictWallet:
+    """Кошелёк в прежнем виде: без __slots__, баланс проверяется сеттером"""
+    def __init__(self, currency_code: str, balance: float):
+        self.currency_code = currency_code
+        self.balance = balance
+
+    @property
+    def balance(self):
+        return self._balance
+
+    @balance.setter
+    def balance(self, value):
+        if not isinstance(value, float):
+            raise TypeError('Баланс должен быть числового типа float.')
+        if value < 0:
+            raise ValueError('Баланс не может быть отрицательным.')
+        self._balance = float(value)
+
+
+def measure(build, repeat: int) -> tuple[float, float]:
+    """Лучшее из repeat время построения (мс) и занятая результатом память (МБ)"""
+    elapsed = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = build()
+        elapsed = min(elapsed, (time.perf_counter() - start) * 1e3)
+        del result
+    gc.collect()
+    tracemalloc.start()
+    result = build()  # noqa: F841 — память считается, пока результат жив
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return elapsed, used / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--wallets", type=int, default=1_000_000)
+    parser.add_argument("--per-user", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    codes = [datagen.BASE, *datagen.RATES][:args.per_user]
+    n_users = args.wallets // len(codes)
+    # записи в том виде, в каком их отдаёт репозиторий
+    records = [{"user_id": i, "wallets": {code: {"balance": float(i % 97 + 1), "version": 0}
+                                          for code in codes}}
+               for i in range(1, n_users + 1)]
+    pairs = [(code, info["balance"]) for record in records for code, info in record["wallets"].items()]
+
+    cases = {
+        "прежний (__dict__)": lambda: [DictWallet(code, balance) for code, balance in pairs],
+        "Wallet(), проверки": lambda: [Wallet(code, balance) for code, balance in pairs],
+        "Wallet.from_trusted": lambda: [Wallet.from_trusted(code, balance) for code, balance in pairs],
+        "Portfolio.from_record": lambda: [Portfolio.from_record(record) for record in records],
+        "Portfolio.from_records": lambda: Portfolio.from_records(records),
+        "Portfolio.units_matrix": lambda: Portfolio.units_matrix(records, codes),
+    }
+    print(f"кошельков: {len(pairs):,} ({n_users:,} портфелей по {len(codes)})")
+    print(f"{'конструктор':>22} | {'время, мс':>9} | {'память, МБ':>10} | {'байт/кошелёк':>12}")
+    for title, build in cases.items():
+        elapsed, used = measure(build, args.repeat)
+        print(f"{title:>22} | {elapsed:>9.1f} | {used:>10.1f} | {used * 2**20 / len(pairs):>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Задержка login/buy в зависимости от числа пользователей.
+
+Данные строит datagen с фиксированным seed: один кошелёк USD на пользователя.
+Запуск: python benchmarks/bench_repository.py [--sizes 100,1000,10000,100000] [--seed 42]
+"""
+import argparse
+import logging
+import os
+import statistics
+import time
+
+import datagen
+
+datagen.use_data_path()
+os.environ.setdefault("EXCHANGERATE_API_KEY", "bench")
+
+from core import usecases  # noqa: E402
+
+logging.getLogger("actions").disabled = True
+
+
+def measure(func, repeat: int) -> float:
+    """Медианное время вызова в микросекундах"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="100,1000,10000,100000")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"backend: {usecases.db.backend}")
+    print(f"{'users':>8} | {'first load, ms':>14} | {'login, us':>10} | "
+          f"{'first buy, ms':>13} | {'buy, us':>10} | {'compact, ms':>11}")
+    for n in (int(x) for x in args.sizes.split(",")):
+        datagen.generate(users=n, wallets=1, history=0, seed=args.seed)
+        target = f"user{n // 2 + 1}"
+
+        start = time.perf_counter()
+        user_id, _ = usecases.login(target, datagen.PASSWORD)
+        first_load = (time.perf_counter() - start) * 1e3
+
+        login_us = measure(lambda: usecases.login(target, datagen.PASSWORD), args.repeat)
+
+        # первая сделка читает портфели с диска: весь файл или один шард
+        start = time.perf_counter()
+        usecases.buy(user_id, "BTC", 0.001)
+        first_buy = (time.perf_counter() - start) * 1e3
+
+        buy_us = measure(lambda: usecases.buy(user_id, "BTC", 0.001), args.repeat)
+
+        start = time.perf_counter()
+        usecases.repo.compact()
+        compact_ms = (time.perf_counter() - start) * 1e3
+        print(f"{n:>8} | {first_load:>14.1f} | {login_us:>10.1f} | "
+              f"{first_buy:>13.1f} | {buy_us:>10.1f} | {compact_ms:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
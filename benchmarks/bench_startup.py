@@ -0,0 +1,105 @@
+"""Время холодного старта CLI: импорт main и одна команда в пакетном режиме.
+
+Импорты замеряются через python -X importtime, тяжёлые зависимости (numpy,
+requests, schedule, dotenv) не должны загружаться до первой команды, которой они нужны.
+Запуск: python benchmarks/bench_startup.py [--runs 10] [--limit-ms 100]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+HEAVY_MODULES = ("numpy", "requests", "urllib3", "schedule", "dotenv", "sqlite3",
+                 "parser_service.updater", "parser_service.api_clients")
+
+
+def child_env() -> dict:
+    env = dict(os.environ, VALUTATRADE_DATA_PATH=tempfile.mkdtemp(prefix="valutatrade_bench_"))
+    # без ключа API старт тоже должен работать
+    env.pop("EXCHANGERATE_API_KEY", None)
+    return env
+
+
+def import_times(env: dict) -> dict[str, tuple[int, int]]:
+    """name -> (собственное, накопленное) время импорта в микросекундах"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                            cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(own), int(cumulative))
+    return times
+
+
+def loaded_heavy_modules(env: dict) -> tuple[list[str], int]:
+    """Тяжёлые модули и число потоков сразу после import main"""
+    code = (f"import sys, threading, main; "
+            f"print(threading.active_count(), *(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    threads, *heavy = result.stdout.split()
+    return heavy, int(threads)
+
+
+def wall_time(args: list[str], env: dict, runs: int, stdin: str = "") -> float:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *args], cwd=ROOT, env=env, input=stdin,
+                       capture_output=True, text=True, check=True)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--limit-ms", type=float, default=100.0)
+    args = parser.parse_args()
+    env = child_env()
+
+    times = import_times(env)
+    main_ms = times["main"][1] / 1000
+    print(f"import main (python -X importtime): {main_ms:.1f} мс")
+    ours = sorted(((cum, name) for name, (_, cum) in times.items()
+                   if name.split(".")[0] in ("main", "valutatrade_hub", "core", "infra",
+                                             "parser_service", "constants", "decorators", "cli")),
+                  reverse=True)
+    for cumulative, name in ours[:8]:
+        print(f"  {cumulative / 1000:7.1f} мс  {name}")
+
+    heavy, threads = loaded_heavy_modules(env)
+    print(f"тяжёлые модули при старте: {', '.join(heavy) if heavy else 'нет'}; потоков: {threads}")
+
+    interpreter = wall_time(["-c", "pass"], env, args.runs)
+    one_shot = wall_time(["main.py", "--batch"], env, args.runs, stdin="help\n")
+    print(f"python -c pass: {interpreter * 1000:.0f} мс; "
+          f"project --batch (help): {one_shot * 1000:.0f} мс "
+          f"(из них приложение ~{(one_shot - interpreter) * 1000:.0f} мс), медиана {args.runs} запусков")
+
+    app_ms = (one_shot - interpreter) * 1000
+    failures = []
+    if main_ms > args.limit_ms:
+        failures.append(f"import main {main_ms:.1f} мс > {args.limit_ms:g} мс")
+    if app_ms > args.limit_ms:
+        failures.append(f"приложение {app_ms:.0f} мс > {args.limit_ms:g} мс")
+    if heavy:
+        failures.append("при старте загружены тяжёлые модули")
+    if threads > 1:
+        # поток записи логов должен стартовать при первой записи, а не при импорте
+        failures.append(f"при импорте запущено лишних потоков: {threads - 1}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Время RatesUpdater.run_update при параллельном опросе провайдеров.
+
+Провайдеры заменены локальными заглушками с заданной задержкой, сеть не нужна.
+Проверяется, что время близко к самому медленному провайдеру, а не к сумме задержек,
+и что зависший провайдер не мешает вернуть частичный результат к сроку UPDATE_DEADLINE.
+При нарушении скрипт завершается с кодом 1.
+Запуск: python benchmarks/bench_update.py [--delays 0.5,0.8] [--deadline 2] [--tolerance 0.3]
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+os.environ["VALUTATRADE_DATA_PATH"] = tempfile.mkdtemp(prefix="valutatrade_bench_")
+os.environ.setdefault("EXCHANGERATE_API_KEY", "bench")
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "valutatrade_hub"))
+
+from parser_service.config import ParserConfig  # noqa: E402
+from parser_service.updater import RatesUpdater  # noqa: E402
+
+logging.getLogger("parser").setLevel(logging.CRITICAL)
+
+
+CG_RATES = {"BTC_USD": 60000.0, "ETH_USD": 3000.0}
+ER_RATES = {"EUR_USD": 1.1, "RUB_USD": 0.0125}
+
+
+class StubClient:
+    """Заглушка API-клиента: спит delay секунд и отдаёт фиксированные курсы"""
+    def __init__(self, delay: float, rates: dict):
+        self.delay = delay
+        self.rates = rates
+
+    def fetch_rates(self):
+        time.sleep(self.delay)
+        return dict(self.rates)
+
+
+def run(updater: RatesUpdater, cg_delay: float, er_delay: float) -> tuple[float, int]:
+    updater.coingecko = StubClient(cg_delay, CG_RATES)
+    updater.exchangerate = StubClient(er_delay, ER_RATES)
+    start = time.perf_counter()
+    count = updater.run_update()
+    return time.perf_counter() - start, count
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--delays", default="0.5,0.8")
+    parser.add_argument("--deadline", type=float, default=2.0)
+    parser.add_argument("--tolerance", type=float, default=0.3,
+                        help="допустимые накладные расходы сверх ожидаемого времени, с")
+    args = parser.parse_args()
+    cg_delay, er_delay = (float(x) for x in args.delays.split(","))
+    if args.deadline < max(cg_delay, er_delay) + args.tolerance:
+        parser.error("--deadline должен быть больше задержек провайдеров на --tolerance")
+
+    config = ParserConfig()
+    config.UPDATE_DEADLINE = args.deadline
+    updater = RatesUpdater(config)
+
+    failures = []
+
+    def check(ok: bool, message: str):
+        print(f"  {'OK' if ok else 'FAIL'}: {message}")
+        if not ok:
+            failures.append(message)
+
+    elapsed, count = run(updater, cg_delay, er_delay)
+    slowest = max(cg_delay, er_delay)
+    print(f"задержки {cg_delay}+{er_delay} с: run_update {elapsed:.2f} с, курсов {count} "
+          f"(последовательно было бы ~{cg_delay + er_delay:.2f} с)")
+    check(count == len(CG_RATES) + len(ER_RATES), f"получены курсы обоих провайдеров ({count})")
+    check(slowest <= elapsed < slowest + args.tolerance,
+          f"время {elapsed:.2f} с ≈ самый медленный провайдер {slowest:.2f} с, а не сумма")
+
+    slow = args.deadline + 1.0
+    elapsed, count = run(updater, cg_delay, slow)
+    print(f"ExchangeRate-API висит {slow:.1f} с при сроке {args.deadline} с: "
+          f"run_update {elapsed:.2f} с, курсов {count} (частичный результат)")
+    check(count == len(CG_RATES), f"частичный результат — курсы CoinGecko ({count})")
+    check(args.deadline <= elapsed < args.deadline + args.tolerance,
+          f"вернулся к сроку {args.deadline:.2f} с, не дожидаясь зависшего провайдера")
+    pairs = updater.storage.get_rates().get("pairs", {})
+    check(all(pairs.get(pair, {}).get("rate") == rate for pair, rate in CG_RATES.items()),
+          "частичный результат сохранён в кэш курсов")
+
+    if failures:
+        print(f"Провалено проверок: {len(failures)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""Время valuation_report на большом числе кошельков.
+
+Данные строит datagen с фиксированным seed, как и в остальных бенчмарках.
+Запуск: python benchmarks/bench_valuation.py [--users 250000] [--wallets 4] [--seed 42]
+"""
+import argparse
+import logging
+import os
+import time
+
+import datagen
+
+datagen.use_data_path()
+os.environ.setdefault("EXCHANGERATE_API_KEY", "bench")
+
+from core import usecases  # noqa: E402
+
+logging.getLogger("actions").disabled = True
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=250_000)
+    parser.add_argument("--wallets", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    datagen.generate(users=args.users, wallets=args.wallets, history=0, seed=args.seed)
+    print(f"генерация данных: {time.perf_counter() - start:.1f} с")
+
+    start = time.perf_counter()
+    usecases.repo.all_portfolios()
+    print(f"загрузка портфелей: {time.perf_counter() - start:.1f} с")
+
+    with open(os.devnull, "w", encoding="utf-8", newline="") as out:
+        start = time.perf_counter()
+        summary = usecases.valuation_report("EUR", out)
+        print(f"valuation_report + CSV: {time.perf_counter() - start:.2f} с")
+    print(summary)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Генератор синтетических данных для бенчмарков.
+
+Заполняет хранилище (JSON-файлы или SQLite, по storage_backend) пользователями,
+кошельками, текущими курсами и историей курсов. Данные детерминированы (--seed).
+Модули приложения импортируются в generate(): путь к данным (VALUTATRADE_DATA_PATH)
+фиксируется при их импорте, поэтому его нужно выставить раньше.
+Запуск: python benchmarks/datagen.py --data-path /tmp/vt --users 10000 --history 1000000
+"""
+import argparse
+import hashlib
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "valutatrade_hub"))
+
+PASSWORD = "1234"
+BASE = "USD"
+RATES = {"BTC": 60000.0, "ETH": 3000.0, "SOL": 150.0, "EUR": 1.1, "GBP": 1.3, "RUB": 0.0125}
+SOURCES = {"BTC": "CoinGecko", "ETH": "CoinGecko", "SOL": "CoinGecko",
+           "EUR": "ExchangeRate-API", "GBP": "ExchangeRate-API", "RUB": "ExchangeRate-API"}
+HISTORY_STEP = timedelta(minutes=1)
+HISTORY_CHUNK = 100_000
+
+
+def use_data_path(path=None) -> str:
+    """Выставляет каталог данных (или создаёт временный); вызывать до generate()"""
+    path = Path(path) if path else Path(tempfile.mkdtemp(prefix="valutatrade_bench_"))
+    path.mkdir(parents=True, exist_ok=True)
+    os.environ["VALUTATRADE_DATA_PATH"] = str(path.resolve())
+    return os.environ["VALUTATRADE_DATA_PATH"]
+
+
+def generate_users(db, n_users: int, n_wallets: int, rnd: random.Random) -> None:
+    from constants import SALT, USERS_FILE
+    from infra.repository import UserRepository
+
+    hashed = hashlib.sha256(f"{PASSWORD}{SALT}".encode()).hexdigest()
+    codes = [BASE, *RATES][:n_wallets]
+    users = [{"user_id": i, "username": f"user{i}", "hashed_password": hashed, "salt": SALT,
+              "registration_date": "2025-01-01T00:00:00"} for i in range(1, n_users + 1)]
+    portfolios = [{"user_id": i,
+                   "wallets": {code: {"balance": round(rnd.uniform(1, 1000), 4)} for code in codes}}
+                  for i in range(1, n_users + 1)]
+    db.save_json(USERS_FILE, users)
+    # в JSON-режиме портфели сразу раскладываются по шардам (portfolio_shards)
+    UserRepository(db).replace_portfolios(portfolios)
+
+
+def history_rows(n_rows: int, end: datetime, rnd: random.Random):
+    """n_rows точек по всем парам: случайное блуждание с шагом HISTORY_STEP до end"""
+    per_pair = -(-n_rows // len(RATES))
+    produced = 0
+    for code, rate in RATES.items():
+        ts = end - HISTORY_STEP * per_pair
+        for _ in range(min(per_pair, n_rows - produced)):
+            ts += HISTORY_STEP
+            rate *= 1 + rnd.gauss(0, 0.002)
+            stamp = ts.isoformat(timespec="seconds")
+            yield {"id": f"{code}_{BASE}_{stamp.replace(':', '').replace('-', '')}",
+                   "from_currency": code, "to_currency": BASE, "rate": rate,
+                   "timestamp": stamp, "source": SOURCES[code]}
+            produced += 1
+
+
+def generate_history(storage, n_rows: int, rnd: random.Random) -> None:
+    chunk = []
+    for row in history_rows(n_rows, datetime.now().replace(microsecond=0), rnd):
+        chunk.append(row)
+        if len(chunk) >= HISTORY_CHUNK:
+            storage.save_history(chunk)
+            chunk = []
+    storage.save_history(chunk)
+
+
+def generate(users: int = 10_000, wallets: int = 3, history: int = 100_000, seed: int = 42) -> dict:
+    """Заполняет текущий каталог данных и возвращает параметры генерации"""
+    from constants import EXCHANGE_RATE_FILE, HISTORY_DIR, RATES_FILE
+    from infra.database import DatabaseManager
+    from parser_service.storage import RatesStorage
+
+    if "VALUTATRADE_DATA_PATH" not in os.environ:
+        use_data_path()
+    rnd = random.Random(seed)
+    db = DatabaseManager()
+    generate_users(db, users, wallets, rnd)
+    storage = RatesStorage(RATES_FILE, EXCHANGE_RATE_FILE, HISTORY_DIR)
+    now = datetime.now().isoformat(timespec="seconds")
+    storage.save_rates({f"{code}_{BASE}": {"rate": rate, "updated_at": now, "source": SOURCES[code]}
+                        for code, rate in RATES.items()}, now)
+    generate_history(storage, history, rnd)
+    return {"users": users, "wallets": wallets, "history": history, "seed": seed,
+            "backend": db.backend, "data_path": os.environ["VALUTATRADE_DATA_PATH"]}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data-path", help="каталог данных (по умолчанию временный)")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--wallets", type=int, default=3)
+    parser.add_argument("--history", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    use_data_path(args.data_path)
+    info = generate(args.users, args.wallets, args.history, args.seed)
+    print(f"Сгенерировано в {info['data_path']} ({info['backend']}): пользователей {args.users}, "
+          f"кошельков на пользователя {args.wallets}, точек истории {args.history}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Нагрузочный тест HTTP API (--serve): запросы в секунду и хвосты задержек.
+
+Каждое из --connections соединений входит своим пользователем и до конца
+--duration шлёт по кругу смесь запросов по keep-alive: портфель, курс, покупка, продажа.
+Без --url сервер запускается отдельным процессом на синтетических данных.
+Запуск: python benchmarks/load_api.py [--connections 32] [--duration 10] [--url http://127.0.0.1:8765]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import datagen
+
+# доли запросов в смеси; продажа меньше покупки, чтобы средств хватало
+MIX = {"portfolio": 0.4, "rate": 0.3, "buy": 0.15, "sell": 0.15}
+BUY_AMOUNT = 0.002
+SELL_AMOUNT = 0.001
+
+
+class Client:
+    """Одно keep-alive соединение с сервером"""
+    def __init__(self, host: str, port: int):
+        self.host, self.port = host, port
+        self.token = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def request(self, method: str, path: str, payload: dict | None = None) -> tuple[int, dict]:
+        body = json.dumps(payload).encode() if payload is not None else b""
+        head = f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(body)}\r\n"
+        if self.token:
+            head += f"Authorization: Bearer {self.token}\r\n"
+        self.writer.write(head.encode() + b"\r\n" + body)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while (line := await self.reader.readline()) not in (b"\r\n", b""):
+            name, _, value = line.decode().partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        return status, json.loads(await self.reader.readexactly(length))
+
+    async def close(self):
+        self.writer.close()
+
+
+def percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def session(host: str, port: int, user_id: int, deadline: float, rnd: random.Random,
+                  latencies: dict, statuses: dict) -> None:
+    client = Client(host, port)
+    await client.connect()
+    status, data = await client.request("POST", "/login", {"username": f"user{user_id}",
+                                                           "password": datagen.PASSWORD})
+    if status != 200:
+        raise RuntimeError(f"Не удалось войти как user{user_id}: {data}")
+    client.token = data["token"]
+    requests = {
+        "portfolio": ("GET", "/portfolio", None),
+        "rate": ("GET", "/rate?from=BTC&to=EUR", None),
+        "buy": ("POST", "/buy", {"currency": "BTC", "amount": BUY_AMOUNT}),
+        "sell": ("POST", "/sell", {"currency": "BTC", "amount": SELL_AMOUNT}),
+    }
+    names, weights = list(MIX), list(MIX.values())
+    await client.request(*requests["buy"])
+    while time.perf_counter() < deadline:
+        name = rnd.choices(names, weights)[0]
+        start = time.perf_counter()
+        status, _ = await client.request(*requests[name])
+        latencies[name].append(time.perf_counter() - start)
+        statuses[status] += 1
+    await client.close()
+
+
+async def run_load(host: str, port: int, connections: int, duration: float) -> tuple[dict, dict, float]:
+    latencies, statuses = defaultdict(list), defaultdict(int)
+    rnd = random.Random(42)
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    await asyncio.gather(*(session(host, port, user_id, deadline, random.Random(rnd.random()),
+                                   latencies, statuses)
+                           for user_id in range(1, connections + 1)))
+    return latencies, statuses, time.perf_counter() - started
+
+
+def start_server(users: int) -> tuple[subprocess.Popen, int]:
+    """Сервер на синтетических данных во временном каталоге (логи тоже пишутся туда)"""
+    workdir = Path(tempfile.mkdtemp(prefix="valutatrade_api_"))
+    os.chdir(workdir)
+    datagen.use_data_path(workdir / "data")
+    datagen.generate(users=users, wallets=2, history=0)
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    env = dict(os.environ, EXCHANGERATE_API_KEY=os.environ.get("EXCHANGERATE_API_KEY", "bench"))
+    server = subprocess.Popen([sys.executable, str(datagen.ROOT / "main.py"), "--serve", "--port", str(port)],
+                              cwd=workdir, env=env, stdout=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return server, port
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError("Сервер не запустился")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--url", default=None, help="уже запущенный сервер; пользователи user1..N с паролем 1234")
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port
+    else:
+        server, port = start_server(args.connections)
+        host = "127.0.0.1"
+    try:
+        latencies, statuses, elapsed = asyncio.run(run_load(host, port, args.connections, args.duration))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    total = sum(len(values) for values in latencies.values())
+    print(f"соединений: {args.connections}, запросов: {total:,} за {elapsed:.1f} с "
+          f"— {total / elapsed:,.0f} запросов/с")
+    print(f"статусы: {dict(sorted(statuses.items()))}")
+    print(f"{'запрос':>10} | {'число':>7} | {'p50, мс':>8} | {'p95, мс':>8} | {'p99, мс':>8} | {'макс, мс':>8}")
+    rows = dict(latencies)
+    rows["все"] = [value for values in latencies.values() for value in values]
+    for name, values in rows.items():
+        if not values:
+            continue
+        print(f"{name:>10} | {len(values):>7} | {statistics.median(values) * 1e3:>8.2f} | "
+              f"{percentile(values, 0.95) * 1e3:>8.2f} | {percentile(values, 0.99) * 1e3:>8.2f} | "
+              f"{max(values) * 1e3:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
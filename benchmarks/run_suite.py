@@ -0,0 +1,154 @@
+"""Набор бенчмарков основных операций на синтетических данных.
+
+Заполняет временный каталог данных генератором datagen.py, замеряет usecases
+(register, login, buy, sell, show_portfolio, show_rates, get_rate, rate_history)
+и RatesUpdater.run_update с провайдерами-заглушками. Сеть не нужна.
+Результат пишется в JSON; --compare печатает изменения относительно прошлого прогона.
+Запуск: python benchmarks/run_suite.py [--users 10000] [--history 1000000] [--output FILE]
+                                       [--compare benchmarks/results/<commit>.json]
+"""
+import argparse
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime
+from pathlib import Path
+
+import datagen
+
+ROOT = datagen.ROOT
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+
+
+class StubClient:
+    """Заглушка API-клиента: отдаёт текущие курсы с небольшим сдвигом"""
+    def __init__(self, codes):
+        self.codes = codes
+        self.calls = 0
+
+    def fetch_rates(self):
+        self.calls += 1
+        return {f"{code}_{datagen.BASE}": datagen.RATES[code] * (1 + self.calls * 1e-4)
+                for code in self.codes}
+
+
+def measure(func, repeat: int) -> dict:
+    """Медиана, p95 и минимум времени вызова (микросекунды)"""
+    samples = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func(i)
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return {"runs": repeat,
+            "median_us": round(statistics.median(samples), 1),
+            "p95_us": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 1),
+            "min_us": round(samples[0], 1)}
+
+
+def git_commit() -> str:
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(args) -> dict:
+    started = time.perf_counter()
+    params = datagen.generate(args.users, args.wallets, args.history, args.seed)
+    generate_s = time.perf_counter() - started
+
+    from core import usecases
+    from parser_service.config import ParserConfig
+    from parser_service.updater import RatesUpdater
+
+    logging.getLogger("actions").disabled = True
+    logging.getLogger("parser").disabled = True
+
+    target = f"user{args.users // 2 + 1}"
+    user_id, _ = usecases.login(target, datagen.PASSWORD)
+    repeat = args.repeat
+    results = {
+        "register": measure(lambda i: usecases.register(f"bench{i}", datagen.PASSWORD),
+                            max(1, repeat // 10)),
+        "login": measure(lambda i: usecases.login(target, datagen.PASSWORD), repeat),
+        "buy": measure(lambda i: usecases.buy(user_id, "BTC", 0.001), repeat),
+        "sell": measure(lambda i: usecases.sell(user_id, "BTC", 0.001), repeat),
+        "show_portfolio": measure(lambda i: usecases.show_portfolio(user_id, "EUR"), repeat),
+        "show_rates": measure(lambda i: usecases.show_rates(), repeat),
+        "get_rate": measure(lambda i: usecases.get_rate("BTC", "EUR"), repeat),
+        "rate_history": measure(lambda i: usecases.rate_history("BTC", "USD", "1d", "1h"),
+                                max(1, repeat // 10)),
+    }
+
+    config = ParserConfig()
+    updater = RatesUpdater(config)
+    updater.coingecko = StubClient(config.CRYPTO_CURRENCIES)
+    updater.exchangerate = StubClient(config.FIAT_CURRENCIES)
+    results["run_update"] = measure(lambda i: updater.run_update(), max(1, repeat // 20))
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "generate_s": round(generate_s, 2),
+            **params,
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, previous: dict) -> None:
+    meta = previous["meta"]
+    print(f"\nСравнение с {meta.get('commit')} ({meta.get('date')}, {meta.get('backend')}, "
+          f"пользователей {meta.get('users')}, точек истории {meta.get('history')}):")
+    for name, stats in current["results"].items():
+        old = previous.get("results", {}).get(name)
+        if not old or not old["median_us"]:
+            print(f"{name:>15}: нет в прошлом прогоне")
+            continue
+        change = stats["median_us"] / old["median_us"] - 1
+        print(f"{name:>15}: {old['median_us']:>10.1f} → {stats['median_us']:>10.1f} мкс ({change:+.0%})")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--wallets", type=int, default=3)
+    parser.add_argument("--history", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--data-path", help="каталог данных (по умолчанию временный)")
+    parser.add_argument("--output", help="JSON с результатами (по умолчанию benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="JSON прошлого прогона для сравнения")
+    args = parser.parse_args()
+
+    datagen.use_data_path(args.data_path)
+    report = run(args)
+
+    print(f"backend: {report['meta']['backend']}, пользователей {args.users}, "
+          f"точек истории {args.history} (генерация {report['meta']['generate_s']} с)")
+    print(f"{'операция':>15} | {'медиана, мкс':>12} | {'p95, мкс':>10} | {'запусков':>8}")
+    for name, stats in report["results"].items():
+        print(f"{name:>15} | {stats['median_us']:>12.1f} | {stats['p95_us']:>10.1f} | {stats['runs']:>8}")
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{report['meta']['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with output.open("w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+    print(f"Результаты: {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
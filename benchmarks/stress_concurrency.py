@@ -0,0 +1,129 @@
+"""Стресс-тест параллельных сделок из нескольких процессов.
+
+Пул процессов покупает валюту одним и тем же (--mode shared) или разным
+(--mode disjoint) пользователям, затем проверяется, что ни одна сделка не потерялась:
+итоговый баланс каждого пользователя равен сумме его покупок.
+С --reshard отдельный процесс всё это время перешардирует портфели (JSON-хранилище).
+Запуск: python benchmarks/stress_concurrency.py [--workers 8] [--trades 200] [--mode both]
+"""
+import argparse
+import logging
+import multiprocessing
+import sys
+import time
+from collections import Counter
+
+import datagen
+
+AMOUNT = 1.0
+
+
+def worker(task: tuple[list[int], int, int | None]) -> tuple[Counter, int]:
+    """Делает trades покупок по кругу по user_ids; возвращает успешные покупки по user_id"""
+    user_ids, trades, compact_every = task
+    from core import usecases
+    from core.exceptions import ConcurrentUpdateError
+
+    logging.getLogger("actions").disabled = True
+    if compact_every:
+        usecases.repo.compact_every = compact_every
+    done = Counter()
+    failed = 0
+    for i in range(trades):
+        user_id = user_ids[i % len(user_ids)]
+        try:
+            usecases.buy(user_id, "BTC", AMOUNT)
+            done[user_id] += 1
+        except ConcurrentUpdateError:
+            # все TRADE_RETRIES попыток проиграли гонку — сделка не прошла, но и не потерялась
+            failed += 1
+    return done, failed
+
+
+def resharder(stop) -> None:
+    """Перешардирует портфели по кругу, пока воркеры торгуют"""
+    from core import usecases
+
+    counts = (4, 16, 7, 32)
+    i = 0
+    while not stop.is_set():
+        usecases.repo.reshard(counts[i % len(counts)])
+        i += 1
+        stop.wait(0.05)
+
+
+def run(mode: str, workers: int, trades: int, users: int,
+        compact_every: int | None = None, reshard: bool = False) -> bool:
+    if mode == "shared":
+        tasks = [(list(range(1, users + 1)), trades, compact_every) for _ in range(workers)]
+    else:
+        per_worker = max(1, users // workers)
+        tasks = [(list(range(w * per_worker + 1, (w + 1) * per_worker + 1)), trades, compact_every)
+                 for w in range(workers)]
+    # spawn: дочерние процессы не наследуют открытые файлы и соединения родителя
+    context = multiprocessing.get_context("spawn")
+    all_ids = sorted({uid for user_ids, _, _ in tasks for uid in user_ids})
+    before = read_in_fresh_process(context, all_ids)
+    stop = context.Event()
+    background = context.Process(target=resharder, args=(stop,)) if reshard else None
+    if background:
+        background.start()
+    start = time.perf_counter()
+    with context.Pool(workers) as pool:
+        results = pool.map(worker, tasks)
+    elapsed = time.perf_counter() - start
+    if background:
+        stop.set()
+        background.join()
+
+    expected = Counter()
+    failed = 0
+    for done, worker_failed in results:
+        expected.update(done)
+        failed += worker_failed
+    after = read_in_fresh_process(context, all_ids)
+    lost = {uid: (expected[uid] * AMOUNT, after[uid] - before[uid]) for uid in all_ids
+            if abs(after[uid] - before[uid] - expected[uid] * AMOUNT) > 1e-9}
+    total = sum(expected.values())
+    print(f"{mode:>8}: {workers} процессов × {trades} сделок за {elapsed:.2f} с "
+          f"({total / elapsed:,.0f} сделок/с), не прошло после повторов: {failed}, "
+          f"потеряно: {len(lost)} пользователей")
+    for uid, (want, got) in list(lost.items())[:5]:
+        print(f"          user_id={uid}: ожидалось +{want}, на диске +{got}")
+    return not lost
+
+
+def read_in_fresh_process(context, user_ids: list[int]) -> dict[int, float]:
+    # свежий процесс читает балансы с диска, а не из памяти воркеров
+    with context.Pool(1) as pool:
+        return pool.apply(read_balances, (user_ids,))
+
+
+def read_balances(user_ids: list[int]) -> dict[int, float]:
+    from core import usecases
+
+    return {uid: usecases.repo.get_portfolio(uid)["wallets"].get("BTC", {}).get("balance", 0.0)
+            for uid in user_ids}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--trades", type=int, default=200, help="сделок на процесс")
+    parser.add_argument("--users", type=int, default=64)
+    parser.add_argument("--mode", choices=("shared", "disjoint", "both"), default="both")
+    parser.add_argument("--compact-every", type=int, help="сжимать журнал чаще, чем в настройках")
+    parser.add_argument("--reshard", action="store_true", help="перешардировать портфели во время теста")
+    parser.add_argument("--data-path", help="каталог данных (по умолчанию временный)")
+    args = parser.parse_args()
+
+    datagen.use_data_path(args.data_path)
+    datagen.generate(users=args.users, wallets=1, history=0)
+    modes = ("disjoint", "shared") if args.mode == "both" else (args.mode,)
+    ok = all([run(mode, args.workers, args.trades, args.users, args.compact_every, args.reshard)
+              for mode in modes])
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
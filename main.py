@@ -1,15 +1,56 @@
+import argparse
 import os
 import sys
 
 sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 # нужно для правильной работы импортов
 
-from valutatrade_hub.cli.interface import run_cli
+from valutatrade_hub.cli.interface import run_batch, run_cli, run_convert, run_reshard
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="project", description="ValutaTrade Hub")
+    parser.add_argument("--batch", nargs="?", const="-", metavar="FILE",
+                        help="выполнить команды из файла (или из stdin, если FILE не указан или '-')")
+    parser.add_argument("--commit-every", type=int, default=None, metavar="N",
+                        help="в пакетном режиме фиксировать сделки каждые N команд")
+    parser.add_argument("--reshard", type=int, metavar="SHARDS",
+                        help="переложить портфели в SHARDS файлов (JSON-хранилище) и выйти")
+    parser.add_argument("--convert-data", metavar="FORMAT", choices=("json", "compact", "msgpack"),
+                        help="переписать файлы data/*.json в формате FORMAT (json, compact, msgpack) и выйти")
+    parser.add_argument("--serve", action="store_true",
+                        help="запустить локальный HTTP/JSON API вместо интерактивного режима")
+    parser.add_argument("--port", type=int, default=None,
+                        help="порт API для --serve (по умолчанию server_port из настроек)")
+    return parser.parse_args(argv)
 
 
 def main():
     """Гланва точка входа"""
-    run_cli()
+    args = parse_args()
+    if args.reshard is not None:
+        run_reshard(args.reshard)
+        return
+    if args.convert_data is not None:
+        run_convert(args.convert_data)
+        return
+    if args.serve:
+        # asyncio нужен только серверу и не должен удлинять старт CLI
+        from valutatrade_hub.api.server import run_serve
+        if args.port is None:
+            run_serve()
+        else:
+            run_serve(port=args.port)
+        return
+    if args.batch is None:
+        run_cli()
+        return
+    kwargs = {} if args.commit_every is None else {"commit_every": args.commit_every}
+    if args.batch == "-":
+        run_batch(sys.stdin, **kwargs)
+    else:
+        with open(args.batch, encoding="utf-8") as f:
+            run_batch(f, **kwargs)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,250 @@
+import asyncio
+import logging
+import math
+import os
+import secrets
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlsplit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# нужно для правильной работы импортов
+from core.exceptions import (
+    ConcurrentUpdateError,
+    CurrencyNotFoundError,
+    InsufficientFundsError,
+    RateUnavailableError,
+    UserExistsError,
+    UserNotFoundError,
+    WalletNotFoundError,
+)
+from core.usecases import (
+    buy,
+    get_rate,
+    login,
+    register,
+    save_stats,
+    sell,
+    show_portfolio,
+    show_rates,
+)
+from infra import serializers
+
+from valutatrade_hub.constants import SERVER_HOST, SERVER_PORT
+
+logger = logging.getLogger("api.server")
+
+# больше тела запроса API не принимает
+MAX_BODY = 64 * 1024
+REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+           405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large",
+           500: "Internal Server Error"}
+
+
+class ApiError(Exception):
+    """Ошибка запроса с HTTP-статусом ответа"""
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _amount(params: dict) -> float:
+    try:
+        amount = float(params["amount"])
+    except (KeyError, TypeError, ValueError):
+        raise ApiError(400, "'amount' должен быть числом") from None
+    if not math.isfinite(amount) or amount < 0:
+        raise ApiError(400, "'amount' должен быть положительным числом")
+    return amount
+
+
+def _text(params: dict, name: str) -> str | None:
+    value = params.get(name)
+    if value is not None and not isinstance(value, str):
+        raise ApiError(400, f"'{name}' должен быть строкой")
+    return value
+
+
+def _required(params: dict, *names: str) -> list:
+    values = [_text(params, name) for name in names]
+    missing = [name for name, value in zip(names, values) if not value]
+    if missing:
+        raise ApiError(400, f"Не заданы параметры: {', '.join(missing)}")
+    return values
+
+
+class ApiServer:
+    """HTTP/JSON API над usecases для локальных клиентов.
+
+    Цикл событий только читает запросы и пишет ответы. Сами usecases блокируются
+    на файлах и замках и делят кэши одного процесса (репозиторий, курсы),
+    поэтому выполняются по очереди в одном рабочем потоке. Состояние между
+    запросами живёт в памяти, а сделки сохраняются через хранилище, как в CLI.
+    """
+    def __init__(self, host: str = SERVER_HOST, port: int = SERVER_PORT):
+        self.host = host
+        self.port = port
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="usecases")
+        # токен → user_id; меняется только в рабочем потоке
+        self.sessions: dict[str, int] = {}
+        self.routes = {
+            ("POST", "/register"): self.register,
+            ("POST", "/login"): self.login,
+            ("POST", "/buy"): self.buy,
+            ("POST", "/sell"): self.sell,
+            ("GET", "/portfolio"): self.show_portfolio,
+            ("GET", "/rate"): self.get_rate,
+            ("GET", "/rates"): self.show_rates,
+        }
+        self._json = serializers.CompactJsonSerializer()
+
+    def _user(self, token: str | None) -> int:
+        user_id = self.sessions.get(token) if token else None
+        if user_id is None:
+            raise ApiError(401, "Вы не вошли в систему. Используйте /login.")
+        return user_id
+
+    def register(self, params: dict, token: str | None) -> dict:
+        username, password = _required(params, "username", "password")
+        return {"message": register(username, password)}
+
+    def login(self, params: dict, token: str | None) -> dict:
+        username, password = _required(params, "username", "password")
+        user_id, message = login(username, password)
+        if user_id is None:
+            raise ApiError(401, message)
+        token = secrets.token_hex(16)
+        self.sessions[token] = user_id
+        return {"message": message, "user_id": user_id, "token": token}
+
+    def buy(self, params: dict, token: str | None) -> dict:
+        user_id = self._user(token)
+        (currency,) = _required(params, "currency")
+        return {"message": buy(user_id, currency.upper(), _amount(params))}
+
+    def sell(self, params: dict, token: str | None) -> dict:
+        user_id = self._user(token)
+        (currency,) = _required(params, "currency")
+        return {"message": sell(user_id, currency.upper(), _amount(params))}
+
+    def show_portfolio(self, params: dict, token: str | None) -> dict:
+        user_id = self._user(token)
+        base = _text(params, "base")
+        return {"message": show_portfolio(user_id, base.upper() if base else None)}
+
+    def get_rate(self, params: dict, token: str | None) -> dict:
+        from_code, to_code = _required(params, "from", "to")
+        return {"message": get_rate(from_code.upper(), to_code.upper())}
+
+    def show_rates(self, params: dict, token: str | None) -> dict:
+        try:
+            top = int(params["top"]) if params.get("top") else None
+        except (TypeError, ValueError):
+            raise ApiError(400, "'top' должен быть целым числом") from None
+        return {"message": show_rates(_text(params, "currency"), top)}
+
+    def call(self, handler, params: dict, token: str | None) -> tuple[int, dict]:
+        """Выполняет обработчик в рабочем потоке и переводит исключения в статусы"""
+        try:
+            return 200, handler(params, token)
+        except ApiError as e:
+            return e.status, {"error": str(e)}
+        except (InsufficientFundsError, ValueError) as e:
+            return 400, {"error": str(e)}
+        except (CurrencyNotFoundError, RateUnavailableError, UserNotFoundError,
+                WalletNotFoundError) as e:
+            return 404, {"error": str(e)}
+        except (UserExistsError, ConcurrentUpdateError) as e:
+            return 409, {"error": str(e)}
+        except Exception as e:
+            logger.exception("Ошибка обработки запроса")
+            return 500, {"error": f"Внутренняя ошибка: {e}"}
+
+    async def dispatch(self, method: str, target: str, headers: dict, body: bytes) -> tuple[int, dict]:
+        url = urlsplit(target)
+        handler = self.routes.get((method, url.path))
+        if handler is None:
+            if any(path == url.path for _, path in self.routes):
+                return 405, {"error": f"Метод {method} не поддерживается для {url.path}"}
+            return 404, {"error": f"Неизвестный путь {url.path}"}
+        params = dict(parse_qsl(url.query))
+        if body:
+            try:
+                data = serializers.json_loads(body)
+            except ValueError:
+                return 400, {"error": "Тело запроса должно быть JSON-объектом"}
+            if not isinstance(data, dict):
+                return 400, {"error": "Тело запроса должно быть JSON-объектом"}
+            params.update(data)
+        auth = headers.get("authorization", "")
+        token = auth[7:].strip() if auth.lower().startswith("bearer ") else None
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.call, handler, params, token)
+
+    def _response(self, status: int, payload: dict, keep_alive: bool) -> bytes:
+        body = self._json.dumps(payload)
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        return head.encode("latin-1") + body
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Одно соединение: запросы HTTP/1.1 по очереди, пока клиент держит keep-alive"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = (version == "HTTP/1.1"
+                              and headers.get("connection", "").lower() != "close")
+                length = int(headers.get("content-length") or 0)
+                if length > MAX_BODY:
+                    writer.write(self._response(413, {"error": "Слишком большое тело запроса"}, False))
+                    await writer.drain()
+                    break
+                body = await reader.readexactly(length) if length else b""
+                status, payload = await self.dispatch(method, target, headers, body)
+                writer.write(self._response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            # оборванное соединение или строка запроса не по протоколу — просто закрываем
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self) -> None:
+        server = await asyncio.start_server(self.handle, self.host, self.port)
+        print(f"API слушает http://{self.host}:{self.port} (Ctrl+C — остановка)")
+        async with server:
+            await server.serve_forever()
+
+
+def run_serve(host: str = SERVER_HOST, port: int = SERVER_PORT):
+    """Запуск API-сервера; курсы обновляются фоновым планировщиком, как в CLI"""
+    from parser_service.scheduler import RatesScheduler
+
+    api = ApiServer(host, port)
+    scheduler = RatesScheduler()
+    scheduler.start()
+    started = time.perf_counter()
+    try:
+        asyncio.run(api.serve())
+    except KeyboardInterrupt:
+        print("\nОстановка сервера")
+    finally:
+        scheduler.stop()
+        api.executor.shutdown(wait=True)
+        save_stats()
+        print(f"Сервер работал {time.perf_counter() - started:.0f} с")
@@ -8,27 +8,44 @@ from core.exceptions import (
     ApiRequestError,
     CurrencyNotFoundError,
     InsufficientFundsError,
+    RateUnavailableError,
+    UserExistsError,
+    UserNotFoundError,
 )
 from core.usecases import (
+    batch_session,
     buy,
+    commit_batch,
+    convert_data,
     get_rate,
     login,
+    rate_history,
     register,
+    reshard_portfolios,
+    save_stats,
     sell,
     show_portfolio,
     show_rates,
+    show_stats,
     update_rates,
+    valuation_report,
 )
-from parser_service.scheduler import RatesScheduler
 
-from valutatrade_hub.constants import DEFAULT_BASE_CURRENCY
+from valutatrade_hub.constants import (
+    BATCH_COMMIT_EVERY,
+    BATCH_COMMIT_SECONDS,
+    DEFAULT_BASE_CURRENCY,
+)
 
 
 def process_command(command: str, current_user_id: int | None):
-    """Основная функция по обработке комманд из терминала"""
+    """Основная функция по обработке комманд из терминала.
+
+    Возвращает (продолжать ли работу, текущий user_id, выполнена ли команда успешно).
+    """
     command = command.strip()
     if not command:
-        return True, current_user_id
+        return True, current_user_id, True
 
     if command.startswith('register'):
         parts = command.split()
@@ -44,15 +61,20 @@ def process_command(command: str, current_user_id: int | None):
             else:
                 print("Ошибка: неверный формат команды. "
                       "Используйте --username NAME --password PASS")
-                return True, current_user_id
+                return True, current_user_id, False
 
         if "username" not in args or "password" not in args:
             print("Использование: register --username NAME --password PASS")
-            return True, current_user_id
+            return True, current_user_id, False
 
-        msg = register(args["username"], args["password"])
+        ok = False
+        try:
+            msg = register(args["username"], args["password"])
+            ok = True
+        except (UserExistsError, ValueError) as e:
+            msg = str(e)
         print(msg)
-        return True, current_user_id
+        return True, current_user_id, ok
 
     elif command.startswith('login'):
         parts = command.split()
@@ -68,19 +90,19 @@ def process_command(command: str, current_user_id: int | None):
             else:
                 print("Ошибка: неверный формат команды. "
                       "Используйте --username NAME --password PASS")
-                return True, current_user_id
+                return True, current_user_id, False
 
         if "username" not in args or "password" not in args:
             print("Использование: login --username NAME --password PASS")
-            return True, current_user_id
+            return True, current_user_id, False
 
         user_id, msg = login(args["username"], args["password"])
         print(msg)
-        return True, user_id
+        return True, user_id, user_id is not None
 
     elif command.startswith('show-portfolio'):
         if not check_auth(current_user_id):
-            return True, current_user_id
+            return True, current_user_id, False
         
         parts = command.split()
         base = DEFAULT_BASE_CURRENCY
@@ -89,13 +111,18 @@ def process_command(command: str, current_user_id: int | None):
             if parts[i].startswith("--base"):
                 base = parts[i+1]
         base = base.upper()
-        msg = show_portfolio(current_user_id, base)
+        ok = False
+        try:
+            msg = show_portfolio(current_user_id, base)
+            ok = True
+        except (CurrencyNotFoundError, RateUnavailableError, UserNotFoundError) as e:
+            msg = str(e)
         print(msg)
-        return True, current_user_id
+        return True, current_user_id, ok
 
     elif command.startswith('buy'):
         if not check_auth(current_user_id):
-            return True, current_user_id
+            return True, current_user_id, False
         parts = command.split()
         args = {}
         for i in range(1, len(parts)):
@@ -106,22 +133,24 @@ def process_command(command: str, current_user_id: int | None):
         
         if "currency" not in args or "amount" not in args:
             print("Использование: buy --currency CODE --amount VALUE")
-            return True, current_user_id
+            return True, current_user_id, False
         if args["amount"] < 0:
             print("'amount' должен быть положительным числом")
-            return True, current_user_id
+            return True, current_user_id, False
+        ok = False
         try:
             msg = buy(current_user_id, args["currency"], args["amount"])
+            ok = True
         except CurrencyNotFoundError as e:
             msg = f"{e}\nСправка: используйте help."
         except Exception as e:
             msg = str(e)
         print(msg)
-        return True, current_user_id
+        return True, current_user_id, ok
         
     elif command.startswith('sell'):
         if not check_auth(current_user_id):
-            return True, current_user_id
+            return True, current_user_id, False
         parts = command.split()
         args = {}
         for i in range(1, len(parts)):
@@ -132,12 +161,14 @@ def process_command(command: str, current_user_id: int | None):
 
         if "currency" not in args or "amount" not in args:
             print("Использование: sell --currency CODE --amount VALUE")
-            return True, current_user_id
+            return True, current_user_id, False
         if args["amount"] < 0:
             print("'amount' должен быть положительным числом")
-            return True, current_user_id
+            return True, current_user_id, False
+        ok = False
         try:
             msg = sell(current_user_id, args["currency"], args["amount"])
+            ok = True
         except InsufficientFundsError as e:
             msg = str(e)
         except CurrencyNotFoundError as e:
@@ -145,7 +176,7 @@ def process_command(command: str, current_user_id: int | None):
         except Exception as e:
             msg = str(e)
         print(msg)
-        return True, current_user_id
+        return True, current_user_id, ok
         
     elif command.startswith('get-rate'):
         parts = command.split()
@@ -157,9 +188,11 @@ def process_command(command: str, current_user_id: int | None):
                 args["to"] = parts[i+1].upper()
         if "from" not in args or "to" not in args:
             print("Использование: get-rate --from CODE --to CODE")
-            return True, current_user_id
+            return True, current_user_id, False
+        ok = False
         try:
             msg = get_rate(args["from"], args["to"])
+            ok = True
         except CurrencyNotFoundError as e:
             msg = f"{e}\nСправка: используйте help."
         except ApiRequestError as e:
@@ -167,9 +200,10 @@ def process_command(command: str, current_user_id: int | None):
         except Exception as e:
             msg = e
         print(msg)
-        return True, current_user_id
+        return True, current_user_id, ok
 
     elif command.startswith('update-rates'):
+        ok = False
         try:
             parts = command.split()
             source = None
@@ -181,15 +215,17 @@ def process_command(command: str, current_user_id: int | None):
                     source = "ExchangeRate-API"
                 else:
                     print("Ошибка: --source должен быть coingecko или exchangerate")
-                    return True, current_user_id
+                    return True, current_user_id, False
             update_rates(source)
             print("Курсы успешно обновлены.")
+            ok = True
         except Exception as e:
             print(f"Ошибка при обновлении: {e}")
-        return True, current_user_id
+        return True, current_user_id, ok
 
 
     elif command.startswith('show-rates'):
+        ok = False
         try:
             parts = command.split()
             currency = None
@@ -205,23 +241,101 @@ def process_command(command: str, current_user_id: int | None):
                         i += 2
                     except ValueError:
                         print("Ошибка: --top должен быть числом")
-                        return True, current_user_id
+                        return True, current_user_id, False
                 else:
                     i += 1
             result = show_rates(currency=currency, top_n=top_n)
             print(result)
+            ok = True
+        except RateUnavailableError as e:
+            print(e)
         except Exception as e:
             print(f"Ошибка: {e}")
-        return True, current_user_id
+        return True, current_user_id, ok
     
+    elif command.startswith('rate-history'):
+        parts = command.split()
+        args = {"period": "30d", "step": None}
+        i = 1
+        while i < len(parts):
+            if parts[i] in ("--from", "--to", "--period", "--step") and i + 1 < len(parts):
+                args[parts[i][2:]] = parts[i + 1]
+                i += 2
+            else:
+                print("Использование: rate-history --from CODE --to CODE "
+                      "[--period 30d] [--step 1h]")
+                return True, current_user_id, False
+        if "from" not in args or "to" not in args:
+            print("Использование: rate-history --from CODE --to CODE "
+                  "[--period 30d] [--step 1h]")
+            return True, current_user_id, False
+        ok = False
+        try:
+            msg = rate_history(args["from"], args["to"], args["period"], args["step"])
+            ok = True
+        except CurrencyNotFoundError as e:
+            msg = f"{e}\nСправка: используйте help."
+        except ValueError as e:
+            msg = str(e)
+        print(msg)
+        return True, current_user_id, ok
+
+    elif command.startswith('valuation-report'):
+        parts = command.split()
+        args = {"base": DEFAULT_BASE_CURRENCY, "output": None}
+        i = 1
+        while i < len(parts):
+            if parts[i] in ("--base", "--output") and i + 1 < len(parts):
+                args[parts[i][2:]] = parts[i + 1]
+                i += 2
+            else:
+                print("Использование: valuation-report [--base CODE] [--output FILE.csv]")
+                return True, current_user_id, False
+        ok = False
+        try:
+            if args["output"]:
+                with open(args["output"], "w", encoding="utf-8", newline="") as f:
+                    msg = valuation_report(args["base"], f)
+                msg += f"\nОтчёт сохранён в {args['output']}"
+            else:
+                msg = valuation_report(args["base"], sys.stdout)
+            ok = True
+        except (CurrencyNotFoundError, RateUnavailableError) as e:
+            msg = str(e)
+        except OSError as e:
+            msg = f"Не удалось записать отчёт: {e}"
+        print(msg)
+        return True, current_user_id, ok
+
+    elif command.startswith('stats'):
+        parts = command.split()
+        ok = True
+        if len(parts) == 1:
+            print(show_stats())
+        elif parts[1] == "--save" and len(parts) <= 3:
+            try:
+                path = save_stats(parts[2] if len(parts) == 3 else None)
+            except OSError as e:
+                print(f"Не удалось записать метрики: {e}")
+                return True, current_user_id, False
+            if path is None:
+                print("Файл метрик не задан: укажите stats --save FILE или metrics_file в настройках")
+                ok = False
+            else:
+                print(f"Метрики дописаны в {path}")
+        else:
+            print("Использование: stats [--save [FILE]]")
+            ok = False
+        return True, current_user_id, ok
+
     elif command.startswith('help'):
         print(show_help())
-        return True, current_user_id
+        return True, current_user_id, True
     elif command in ('quit', 'exit'):
-        return False, current_user_id
+        return False, current_user_id, True
     else:
         print('Неизвестная команда. Введите help для списка команд.')
-        return True, current_user_id
+        return True, current_user_id, False
     
 
 def show_help():
@@ -234,7 +348,10 @@ def show_help():
             '5. продать валюту (sell);\n'
             '6. получить курс валюты (get-rate);\n'
             '7. обновить курс валют (update-rates);\n'
-            '8. показать весь курс валют (show-rates).')
+            '8. показать весь курс валют (show-rates);\n'
+            '9. история курса за период (rate-history);\n'
+            '10. оценка всех портфелей в CSV (valuation-report);\n'
+            '11. время выполнения команд p50/p95/p99 (stats).')
 
 
 def get_input(prompt="> "):
@@ -256,6 +373,9 @@ def check_auth(current_user_id):
 
 def run_cli():
     """Функция запуска обработки комманд из терминала"""
+    # планировщик тянет за собой HTTP-клиентов, поэтому импортируется только в интерактивном режиме
+    from parser_service.scheduler import RatesScheduler
+
     print('Добро пожаловать!')
     scheduler = RatesScheduler()
     scheduler.start()
@@ -263,7 +383,61 @@ def run_cli():
     work = True
     while work:
         command = get_input("> ")
-        work, current_user_id = process_command(command, current_user_id)
-        scheduler.run_once()
-        time.sleep(0.1)
-    scheduler.stop()
\ No newline at end of file
+        work, current_user_id, _ = process_command(command, current_user_id)
+    scheduler.stop()
+    save_stats()
+
+
+def run_batch(lines, commit_every: int = BATCH_COMMIT_EVERY,
+              commit_seconds: float = BATCH_COMMIT_SECONDS):
+    """Пакетный режим: команды из файла или stdin без приглашения и пауз.
+
+    Сделки фиксируются группами: каждые commit_every команд и не реже чем раз
+    в commit_seconds секунд, чтобы пакет не держал запись в SQLite и другие CLI
+    не ждали его до конца (0 — без этого ограничения).
+    """
+    current_user_id = None
+    executed = errors = commits = 0
+    started = last_commit = time.perf_counter()
+    with batch_session():
+        for line_no, line in enumerate(lines, start=1):
+            command = line.strip()
+            if not command or command.startswith("#"):
+                continue
+            try:
+                work, current_user_id, ok = process_command(command, current_user_id)
+            except Exception as e:
+                # одна битая строка не должна останавливать весь пакет
+                print(f"Строка {line_no}: ошибка '{command}': {e}")
+                work, ok = True, False
+            executed += 1
+            if not ok:
+                errors += 1
+            if not work:
+                break
+            now = time.perf_counter()
+            if ((commit_every and executed % commit_every == 0)
+                    or (commit_seconds and now - last_commit >= commit_seconds)):
+                commit_batch()
+                commits += 1
+                last_commit = now
+    commits += 1
+    elapsed = time.perf_counter() - started
+    save_stats()
+    throughput = executed / elapsed if elapsed > 0 else 0.0
+    print(f"Пакет выполнен: {executed} команд за {elapsed:.2f} с "
+          f"({throughput:,.0f} команд/с), ошибок: {errors}, фиксаций: {commits}")
+
+
+def run_reshard(shards: int):
+    """Перешардирование портфелей без остановки других запущенных CLI"""
+    started = time.perf_counter()
+    print(reshard_portfolios(shards))
+    print(f"Готово за {time.perf_counter() - started:.2f} с")
+
+
+def run_convert(data_format: str):
+    """Перезапись файлов данных в другом формате"""
+    started = time.perf_counter()
+    print(convert_data(data_format))
+    print(f"Готово за {time.perf_counter() - started:.2f} с")
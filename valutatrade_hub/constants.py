@@ -1,21 +1,41 @@
-import os
-
-from dotenv import load_dotenv
 from infra.settings import SettingsLoader
 
-load_dotenv()
 settings = SettingsLoader()
 
 DEFAULT_BASE_CURRENCY = settings.get("default_base_currency")
+DATA_DIR = settings.get("data_path")
 USERS_FILE = settings.get("data_path") / "users.json"
 PORTFOLIOS_FILE = settings.get("data_path") / "portfolios.json"
+PORTFOLIOS_DIR = settings.get("data_path") / "portfolios"
 RATES_FILE = settings.get("data_path") / "rates.json"
-EXCHANGE_RATE_FILE = settings.get("data_path") / "exchange_rates.json"
+EXCHANGE_RATE_FILE = settings.get("data_path") / "exchange_rates.jsonl"
+HISTORY_DIR = settings.get("data_path") / "history"
+RATE_LIMITS_FILE = settings.get("data_path") / "rate_limits.json"
+TRADES_JOURNAL_FILE = settings.get("data_path") / "trades.journal"
+JOURNAL_CHECKPOINT_FILE = settings.get("data_path") / "trades.checkpoint"
 DEFAULT_BASE_CURRENCY = settings.get("default_base_currency")
 RATES_TTL = settings.get("rates_ttl_seconds", 300)
+RATES_REFRESH_INTERVAL = settings.get("rates_refresh_interval_seconds")
+REFRESH_INTERVALS = settings.get("refresh_intervals")
+ADAPTIVE_REFRESH = settings.get("adaptive_refresh")
+STORAGE_BACKEND = settings.get("storage_backend")
+DATA_FORMAT = settings.get("data_format")
+SQLITE_FILE = settings.get("sqlite_file")
+PORTFOLIO_SHARDS = settings.get("portfolio_shards")
+JOURNAL_COMPACT_EVERY = settings.get("journal_compact_every")
+JOURNAL_FSYNC = settings.get("journal_fsync")
+BATCH_COMMIT_EVERY = settings.get("batch_commit_every")
+BATCH_COMMIT_SECONDS = settings.get("batch_commit_seconds")
+SQLITE_BUSY_TIMEOUT = settings.get("sqlite_busy_timeout_seconds")
+LOCKS_DIR = settings.get("data_path") / "locks"
+LOCK_STRIPES = settings.get("lock_stripes")
+SERVER_HOST = settings.get("server_host")
+SERVER_PORT = settings.get("server_port")
+# сколько раз сделка пересчитывается, если кошелёк одновременно изменил другой процесс
+TRADE_RETRIES = 5
+METRICS_FILE = settings.get("metrics_file") or None
 SALT = "haleluya2003"
-EXCHANGERATE_API_KEY = os.getenv("EXCHANGERATE_API_KEY")
-PARSER_LOG = "data/parser.log"
-ACTIONS_LOG = "data/actions.log"
-LOG_FORMAT = "%(asctime)s | %(name)s | %(levelname)s | %(message)s"
-DATE_FORMAT = "%Y-%m-%d %H:%M:%S,%f"
\ No newline at end of file
+PARSER_LOG = settings.get("parser_log_path")
+ACTIONS_LOG = settings.get("log_path")
+LOG_MAX_BYTES = settings.get("log_max_bytes")
+LOG_BACKUP_COUNT = settings.get("log_backup_count")
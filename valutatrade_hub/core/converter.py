@@ -0,0 +1,85 @@
+from typing import TYPE_CHECKING
+
+from constants import DEFAULT_BASE_CURRENCY
+from core.exceptions import CurrencyNotFoundError
+
+if TYPE_CHECKING:
+    import numpy as np
+
+
+class CurrencyConverter:
+    """Матрица кросс-курсов N×N через базовую валюту.
+
+    matrix[i, j] — сколько единиц валюты codes[j] стоит одна единица codes[i].
+    Матрица пересобирается, только когда RatesCache отдал новые данные.
+    NumPy импортируется при первой сборке, а не при старте CLI.
+    """
+    def __init__(self, rates_source=None, base: str = DEFAULT_BASE_CURRENCY):
+        self.rates_source = rates_source
+        self.base = base
+        self.codes: list[str] = []
+        self.index: dict[str, int] = {}
+        self.matrix = None
+        self._source = None
+
+    @classmethod
+    def from_rates(cls, to_base: dict[str, float], base: str = DEFAULT_BASE_CURRENCY):
+        """Конвертер по готовому словарю {код: курс к base}"""
+        converter = cls(None, base)
+        converter._build(to_base)
+        return converter
+
+    def _refresh(self) -> None:
+        if self.rates_source is None:
+            if self.matrix is None:
+                self._build({})
+            return
+        data = self.rates_source.get()
+        if data is self._source:
+            return
+        self._source = data
+        pairs = data.get("pairs", {}) if isinstance(data, dict) else {}
+        suffix = f"_{self.base}"
+        self._build({pair[:-len(suffix)]: info["rate"]
+                     for pair, info in pairs.items()
+                     if pair.endswith(suffix) and info.get("rate")})
+
+    def _build(self, to_base: dict[str, float]) -> None:
+        import numpy as np
+        to_base = {code: rate for code, rate in to_base.items() if rate}
+        to_base[self.base] = 1.0
+        self.codes = sorted(to_base)
+        self.index = {code: i for i, code in enumerate(self.codes)}
+        vector = np.array([to_base[code] for code in self.codes], dtype=float)
+        self.matrix = vector[:, None] / vector[None, :]
+
+    def knows(self, code: str) -> bool:
+        self._refresh()
+        return code.upper() in self.index
+
+    def rate(self, from_code: str, to_code: str) -> float:
+        """Курс from→to за O(1)"""
+        self._refresh()
+        from_code, to_code = from_code.upper(), to_code.upper()
+        if from_code not in self.index or to_code not in self.index:
+            raise CurrencyNotFoundError(f"Пара {from_code}_{to_code} не найдена")
+        return float(self.matrix[self.index[from_code], self.index[to_code]])
+
+    def rates_to(self, to_code: str) -> "np.ndarray":
+        """Вектор курсов всех валют codes к to_code (столбец матрицы)"""
+        self._refresh()
+        to_code = to_code.upper()
+        if to_code not in self.index:
+            raise CurrencyNotFoundError(f"Неизвестная базовая валюта '{to_code}'")
+        return self.matrix[:, self.index[to_code]]
+
+    def convert_many(self, amounts, from_codes, to_code: str) -> "np.ndarray":
+        """Векторный пересчёт сумм amounts (в валютах from_codes) в to_code.
+
+        Валюты без курса дают 0, как и раньше в show_portfolio.
+        """
+        import numpy as np
+        column = self.rates_to(to_code)
+        idx = np.fromiter((self.index.get(code, -1) for code in from_codes), dtype=np.intp)
+        rates = np.where(idx >= 0, column[idx], 0.0)
+        return np.asarray(amounts, dtype=float) * rates
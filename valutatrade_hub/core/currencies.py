@@ -7,9 +7,10 @@ CURRENCY_REGISTRY = {
     "GBP": FiatCurrency("British Pound", "GBP", "United Kingdom"),
     "RUB": FiatCurrency("Russian Ruble", "RUB", "Russia"),
 
-    "BTC": CryptoCurrency("Bitcoin", "BTC", "SHA-256", 1.12e12),
-    "ETH": CryptoCurrency("Ethereum", "ETH", "Ethash", 3.85e11),
-    "SOL": CryptoCurrency("Solana", "SOL", "Proof-of-History", 7.5e10),
+    # минимальные единицы: сатоши (1e-8), gwei (1e-9, wei не помещается в int64), лампорты (1e-9)
+    "BTC": CryptoCurrency("Bitcoin", "BTC", "SHA-256", 1.12e12, decimals=8),
+    "ETH": CryptoCurrency("Ethereum", "ETH", "Ethash", 3.85e11, decimals=9),
+    "SOL": CryptoCurrency("Solana", "SOL", "Proof-of-History", 7.5e10, decimals=9),
 }
 
 def get_currency(code: str) -> Currency:
@@ -7,6 +7,30 @@ class InsufficientFundsError(Exception):
     pass
 
 
+class ConcurrentUpdateError(Exception):
+    """Ошибка: данные успел изменить другой процесс (устаревшая версия)."""
+    pass
+
+
 class ApiRequestError(Exception):
     """Ошибка: ошибка при обращении к внешнему API."""
-    pass
\ No newline at end of file
+    pass
+
+class UserExistsError(Exception):
+    """Ошибка: пользователь с таким именем уже существует."""
+    pass
+
+
+class UserNotFoundError(Exception):
+    """Ошибка: пользователь или его портфель не найден."""
+    pass
+
+
+class WalletNotFoundError(Exception):
+    """Ошибка: у пользователя нет кошелька в этой валюте."""
+    pass
+
+
+class RateUnavailableError(Exception):
+    """Ошибка: курса нет в локальном кэше или кэш не читается."""
+    pass
@@ -1,12 +1,35 @@
+import gc
 import hashlib
+import math
 from abc import ABC, abstractmethod
 from datetime import datetime
 
 from constants import DEFAULT_BASE_CURRENCY
+from core.converter import CurrencyConverter
+
+# балансы хранятся в int64: больше единиц не поместится в массив
+MAX_UNITS = 2**63 - 1
+# масштаб для валют вне CURRENCY_REGISTRY (старые записи хранилища)
+DEFAULT_DECIMALS = 8
+_SCALES: dict[str, int] = {}
+
+
+def minor_scale(currency_code: str) -> int:
+    """Сколько минимальных единиц (сатоши, копеек) в одной единице валюты"""
+    scale = _SCALES.get(currency_code)
+    if scale is None:
+        # реестр сам импортирует этот модуль, поэтому обращаемся к нему лениво
+        from core.currencies import CURRENCY_REGISTRY
+        currency = CURRENCY_REGISTRY.get(currency_code)
+        scale = currency.scale if currency is not None else 10 ** DEFAULT_DECIMALS
+        _SCALES[currency_code] = scale
+    return scale
 
 
 class User:
     """Пользователь системы"""
+    __slots__ = ("_user_id", "_username", "_salt", "_hashed_password", "_registration_date")
+
     def __init__(self, user_id: int, username: str, password: str, salt: str):
         self._user_id = user_id
         self.username = username
@@ -61,32 +84,86 @@ class User:
 
 
 class Wallet:
-    """Кошелёк пользователя для одной конкретной валюты"""
+    """Кошелёк пользователя для одной конкретной валюты.
+
+    Баланс хранится целым числом минимальных единиц валюты (фиксированная точка),
+    поэтому сделки не накапливают ошибку округления float.
+    """
+    __slots__ = ("currency_code", "_units")
+
     def __init__(self, currency_code: str, balance: float):
         self.currency_code = currency_code
         self.balance = balance
-    
+
+    @classmethod
+    def from_trusted(cls, currency_code: str, balance: float) -> "Wallet":
+        """Кошелёк из уже проверенных данных хранилища, без проверок сеттера"""
+        wallet = cls.__new__(cls)
+        wallet.currency_code = currency_code
+        units = round(balance * (_SCALES.get(currency_code) or minor_scale(currency_code)))
+        if units > MAX_UNITS:
+            # иначе массивы int64 (unit_arrays, units_matrix) молча получили бы мусор
+            raise ValueError(f'Баланс {currency_code} превышает допустимый.')
+        wallet._units = units
+        return wallet
+
+    @property
+    def scale(self) -> int:
+        return _SCALES.get(self.currency_code) or minor_scale(self.currency_code)
+
+    def to_units(self, amount: float) -> int:
+        """Сумма в минимальных единицах валюты кошелька"""
+        if not math.isfinite(amount):
+            raise ValueError('Сумма должна быть конечным числом.')
+        return round(amount * self.scale)
+
+    @property
+    def units(self) -> int:
+        return self._units
+
+    @units.setter
+    def units(self, value: int):
+        if value < 0:
+            raise ValueError('Баланс не может быть отрицательным.')
+        if value > MAX_UNITS:
+            raise ValueError(f'Баланс {self.currency_code} превышает допустимый.')
+        self._units = value
+
     @property
     def balance(self):
-        return self._balance
+        return self._units / self.scale
 
     @balance.setter
     def balance(self, value):
-        if not isinstance(value, float):
-            raise TypeError('Баланс должен быть числового типа float.')
-        if value < 0:
+        # то же, что self.units = self.to_units(value), но без лишних вызовов свойств:
+        # сеттер работает в каждом конструкторе Wallet
+        if value.__class__ is not float and (not isinstance(value, int) or isinstance(value, bool)):
+            raise TypeError('Баланс должен быть числом.')
+        if not math.isfinite(value):
+            raise ValueError('Сумма должна быть конечным числом.')
+        code = self.currency_code
+        units = round(value * (_SCALES.get(code) or minor_scale(code)))
+        if units < 0:
             raise ValueError('Баланс не может быть отрицательным.')
-        self._balance = float(value)
+        if units > MAX_UNITS:
+            raise ValueError(f'Баланс {code} превышает допустимый.')
+        self._units = units
     
     def deposit(self, amount: float):
         if amount < 0:
             raise ValueError("Сумма пополнения (deposit) не может быть отрицательной.")
-        self.balance = self.balance + amount
+        units = self.to_units(amount)
+        if amount and not units:
+            raise ValueError(f"Сумма меньше минимальной единицы {self.currency_code}.")
+        self.units = self._units + units
         
     def withdraw(self, amount: float):
-        if amount > self.balance:
+        units = self.to_units(amount)
+        if amount and not units:
+            raise ValueError(f"Сумма меньше минимальной единицы {self.currency_code}.")
+        if units > self._units:
             return ('На балансе недостаточно средств.')
-        self.balance = self.balance - amount
+        self.units = self._units - units
     
     def get_balance_info(self):
         return self.balance
@@ -94,10 +171,72 @@ class Wallet:
     
 class Portfolio:
     """Управление всеми кошельками одного пользователя"""
+    __slots__ = ("_user_id", "_wallets")
+
     def __init__(self, user_id: int, wallets: dict[str, Wallet] | None = None):
         self._user_id = user_id
         self._wallets: dict[str, Wallet] = wallets or {}
 
+    @classmethod
+    def from_record(cls, record: dict) -> "Portfolio":
+        """Портфель из записи хранилища: {"user_id", "wallets": {код: {"balance", ...}}}.
+
+        Баланс проверялся при записи, поэтому кошельки создаются без повторных проверок.
+        """
+        trusted = Wallet.from_trusted
+        wallets = {code: trusted(code, info.get("balance", 0.0))
+                   for code, info in record.get("wallets", {}).items()}
+        return cls(record["user_id"], wallets)
+
+    @classmethod
+    def from_records(cls, records) -> list["Portfolio"]:
+        """Портфели пачкой из записей хранилища (см. from_record).
+
+        Масштаб ищется один раз на валюту, а округление и проверка диапазона
+        выполняются одной операцией numpy над всеми балансами валюты: np.rint
+        того же произведения float64 округляет так же, как round() в Wallet.to_units.
+        Объекты затем собираются без сеттеров, при выключенном циклическом сборщике.
+        """
+        import numpy as np
+        records = records if isinstance(records, list) else list(records)
+        balances: dict[str, list] = {}
+        for record in records:
+            for code, info in record.get("wallets", {}).items():
+                column = balances.get(code)
+                if column is None:
+                    column = balances[code] = []
+                column.append(info.get("balance", 0.0))
+        units = {}
+        for code, column in balances.items():
+            values = np.rint(np.array(column, dtype=np.float64) * minor_scale(code))
+            # 2.0**63 — первое значение, которое уже не помещается в int64
+            if values.size and not (values.min() >= 0 and values.max() < 2.0 ** 63):
+                raise ValueError(f"Баланс {code} в хранилище вне допустимого диапазона.")
+            units[code] = iter(values.astype(np.int64).tolist())
+
+        new_wallet, new_portfolio = Wallet.__new__, cls.__new__
+        portfolios = []
+        enabled = gc.isenabled()
+        # миллион новых объектов запускает циклический сборщик десятки раз впустую:
+        # циклов в них нет, а время сборки растёт вдвое
+        gc.disable()
+        try:
+            for record in records:
+                wallets = {}
+                for code in record.get("wallets", {}):
+                    wallet = new_wallet(Wallet)
+                    wallet.currency_code = code
+                    wallet._units = next(units[code])
+                    wallets[code] = wallet
+                portfolio = new_portfolio(cls)
+                portfolio._user_id = record["user_id"]
+                portfolio._wallets = wallets
+                portfolios.append(portfolio)
+        finally:
+            if enabled:
+                gc.enable()
+        return portfolios
+
     @property
     def user(self):
         return self._user_id
@@ -119,27 +258,87 @@ class Portfolio:
             raise KeyError(f"Кошелёк для {code} не найден.")
         return self._wallets[code]
 
-    def get_total_value(self, base_currency=DEFAULT_BASE_CURRENCY, exchange_rates=None):
+    def get_total_value(self, base_currency=DEFAULT_BASE_CURRENCY, exchange_rates=None,
+                        converter: CurrencyConverter | None = None):
         """Возвращает суммарную стоимость всех кошельков в базовой валюте"""
-        if exchange_rates is None:
-            exchange_rates = {
-                'USD': 1.0,
-                'BTC': 30000.0,
-                'EUR': 1.1}
-        base_rate = exchange_rates.get(base_currency.upper(), 1.0)
-        total = 0.0
-        for wallet in self._wallets.values():
-            rate = exchange_rates.get(wallet.currency_code, 0)
-            total += wallet.balance * rate / base_rate
-        return total
+        if converter is None:
+            if exchange_rates is None:
+                exchange_rates = {
+                    'USD': 1.0,
+                    'BTC': 30000.0,
+                    'EUR': 1.1}
+            converter = CurrencyConverter.from_rates(exchange_rates)
+        codes, units, scales = self.unit_arrays()
+        return float(converter.convert_many(units / scales, codes, base_currency).sum())
+
+    def unit_arrays(self):
+        """Коды валют, балансы в минимальных единицах и их масштабы непрерывными массивами int64"""
+        import numpy as np
+        wallets = list(self._wallets.values())
+        codes = [wallet.currency_code for wallet in wallets]
+        units = np.fromiter((wallet._units for wallet in wallets), dtype=np.int64, count=len(wallets))
+        scales = np.fromiter((minor_scale(code) for code in codes), dtype=np.int64, count=len(codes))
+        return codes, units, scales
+
+    @staticmethod
+    def units_matrix(records: list[dict], codes: list[str]):
+        """Балансы многих портфелей одной непрерывной матрицей int64 пользователи × codes.
+
+        Вместо миллиона объектов Wallet — 8 байт на кошелёк. Ячейки округляются
+        так же, как Wallet.to_units, и попадают в int64 без промежуточной матрицы
+        float; баланс вне 0..MAX_UNITS — ValueError. Валюты не из codes пропускаются.
+        Суммы по столбцам — column_totals.
+        Возвращает (user_ids, units, scales).
+        """
+        import numpy as np
+        width = len(codes)
+        column = {code: (j, minor_scale(code)) for j, code in enumerate(codes)}
+        # ячейки копятся плоским списком целых и одним вызовом становятся int64:
+        # это быстрее записи по одной ячейке в массив numpy
+        cells = [0] * (len(records) * width)
+        ids = [0] * len(records)
+        offset = 0
+        for row, record in enumerate(records):
+            ids[row] = record["user_id"]
+            for code, info in record.get("wallets", {}).items():
+                cell = column.get(code)
+                if cell is not None:
+                    cells[offset + cell[0]] = round(info.get("balance", 0.0) * cell[1])
+            offset += width
+        try:
+            units = np.array(cells, dtype=np.int64).reshape(len(records), width)
+        except OverflowError:
+            units = None
+        if units is None or (units.size and units.min() < 0):
+            raise ValueError("Баланс в хранилище вне допустимого диапазона.")
+        user_ids = np.array(ids, dtype=np.int64)
+        scales = np.array([minor_scale(code) for code in codes], dtype=np.int64)
+        return user_ids, units, scales
+
+    @staticmethod
+    def column_totals(units) -> list[int]:
+        """Точные суммы матрицы units по столбцам (целые Python).
+
+        Пока rows × max не выходит за MAX_UNITS, сумма в int64 переполниться не может;
+        иначе столбцы складываются целыми Python, а не молча по модулю 2**64.
+        """
+        rows, cols = units.shape
+        if rows == 0:
+            return [0] * cols
+        if rows * int(units.max()) <= MAX_UNITS:
+            return units.sum(axis=0).tolist()
+        return [sum(column) for column in units.T.tolist()]
 
 
 
 class Currency(ABC):
     """Абстрактный класс валюты"""
-    def __init__(self, name: str, code: str):
+    __slots__ = ("_name", "_code", "_decimals")
+
+    def __init__(self, name: str, code: str, decimals: int = 2):
         self.name = name
         self.code = code
+        self.decimals = decimals
 
     @property
     def name(self) -> str:
@@ -168,6 +367,24 @@ class Currency(ABC):
                              "верхний регистр, без пробелов.")
         self._code = value
 
+    @property
+    def decimals(self) -> int:
+        """Знаков после запятой в минимальной единице (2 — копейки, 8 — сатоши)"""
+        return self._decimals
+
+    @decimals.setter
+    def decimals(self, value: int) -> None:
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise TypeError("decimals должен быть int.")
+        # 10**18 единиц не оставили бы в int64 места даже для десятка монет
+        if not 0 <= value <= 12:
+            raise ValueError("decimals должен быть от 0 до 12.")
+        self._decimals = value
+
+    @property
+    def scale(self) -> int:
+        return 10 ** self._decimals
+
     @abstractmethod
     def get_display_info(self) -> str:
         pass
@@ -175,8 +392,10 @@ class Currency(ABC):
 
 class FiatCurrency(Currency):
     """Фиатная валюта"""
-    def __init__(self, name: str, code: str, issuing_country: str):
-        super().__init__(name, code)
+    __slots__ = ("_issuing_country",)
+
+    def __init__(self, name: str, code: str, issuing_country: str, decimals: int = 2):
+        super().__init__(name, code, decimals)
         self.issuing_country = issuing_country
 
     @property
@@ -198,8 +417,11 @@ class FiatCurrency(Currency):
 
 class CryptoCurrency(Currency):
     """Криптовалюта"""
-    def __init__(self, name: str, code: str, algorithm: str, market_cap: float):
-        super().__init__(name, code)
+    __slots__ = ("_algorithm", "_market_cap")
+
+    def __init__(self, name: str, code: str, algorithm: str, market_cap: float,
+                 decimals: int = 8):
+        super().__init__(name, code, decimals)
         self.algorithm = algorithm
         self.market_cap = market_cap
 
@@ -1,45 +1,86 @@
+import csv
 import os
 import sys
+from datetime import datetime, timedelta
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 # нужно для правильной работы импортов
 
 from constants import (
+    DATA_DIR,
+    DATA_FORMAT,
     DEFAULT_BASE_CURRENCY,
-    PORTFOLIOS_FILE,
+    EXCHANGE_RATE_FILE,
+    HISTORY_DIR,
+    METRICS_FILE,
     RATES_FILE,
     SALT,
-    USERS_FILE,
+    TRADE_RETRIES,
 )
+from core.converter import CurrencyConverter
 from core.currencies import get_currency
 from core.exceptions import (
+    ConcurrentUpdateError,
     CurrencyNotFoundError,
     InsufficientFundsError,
+    RateUnavailableError,
+    UserExistsError,
+    UserNotFoundError,
+    WalletNotFoundError,
 )
 from core.models import Portfolio, User, Wallet
-from core.utils import is_fresh
+from core.utils import is_fresh, parse_duration
 from decorators import log_action
 from infra.database import DatabaseManager
-from parser_service.config import ParserConfig
-from parser_service.updater import RatesUpdater
+from infra.rates_cache import RatesCache
+from infra.repository import UserRepository
+from parser_service.storage import RatesStorage
+
+from valutatrade_hub.metrics import latency_metrics
 
 db = DatabaseManager()
+repo = UserRepository(db)
+rates_cache = RatesCache(db)
+converter = CurrencyConverter(rates_cache)
+
+
+def batch_session():
+    """Пакетная сессия: сделки внутри неё фиксируются группой, а не по одной"""
+    return repo.batch()
+
+
+def commit_batch():
+    """Промежуточная групповая фиксация внутри batch_session"""
+    repo.commit()
 
 
+@log_action("REGISTER", log=False)
 def register(username: str, password: str):
     """Регистрация"""
     if not username:
-        return "Ошибка: username не может быть пустым."
+        raise ValueError("Ошибка: username не может быть пустым.")
     if len(password) < 4:
-        return "Ошибка: пароль должен быть длиной не менее 4 символов."
+        raise ValueError("Ошибка: пароль должен быть длиной не менее 4 символов.")
     
-    user_data = db.load_json(USERS_FILE)
-    if user_data:
-        for i in user_data:
-            if i['username'] == username:
-                return f"Ошибка: пользователь '{username}' уже существует."
-        
-    user_id = len(user_data) + 1
+    for attempt in range(TRADE_RETRIES):
+        if repo.get_user_by_name(username):
+            raise UserExistsError(f"Ошибка: пользователь '{username}' уже существует.")
+        try:
+            user_model = _add_user(username, password)
+            break
+        except ConcurrentUpdateError:
+            # id или имя занял параллельный процесс — проверяем заново
+            if attempt == TRADE_RETRIES - 1:
+                raise
+
+    msg = (f"Пользователь '{user_model._username}' зарегистрирован "
+          f"(id={user_model._user_id}). "
+          f"Войдите: login --username {user_model._username} --password ****")
+    return msg
+
+
+def _add_user(username: str, password: str) -> User:
+    user_id = repo.next_user_id()
 
     user_model = User(user_id=user_id, username=username, password=password, salt=SALT)
     
@@ -50,37 +91,16 @@ def register(username: str, password: str):
         "salt": user_model._salt,
         "registration_date": user_model._registration_date.isoformat()
     }
-    user_data.append(user_model_data)
-    
-    
-    portfolio_data = db.load_json(PORTFOLIOS_FILE)
-    
-    portfolio_model = Portfolio(user_id=user_id, wallets={})
-    
-    portfolio_model_data = {
-        "user_id": portfolio_model._user_id,
-        "wallets": {}
-    }
-    portfolio_data.append(portfolio_model_data)
-    
-    db.save_json(PORTFOLIOS_FILE, portfolio_data)
-    db.save_json(USERS_FILE, user_data)
-    
-    msg = (f"Пользователь '{user_model._username}' зарегистрирован "
-          f"(id={user_model._user_id}). "
-          f"Войдите: login --username {user_model._username} --password ****")
-    return msg
 
+    # портфель нового пользователя пуст: хранилище заводит его вместе с пользователем
+    repo.add_user(user_model_data)
+    return user_model
 
+
+@log_action("LOGIN", log=False)
 def login(username: str, password: str):
     """Авторизация"""
-    user_data = db.load_json(USERS_FILE)
-
-    user_data_json = None
-    for user in user_data:
-        if user["username"] == username:
-            user_data_json = user
-            break
+    user_data_json = repo.get_user_by_name(username)
     if not user_data_json:
         return None, f"Пользователь '{username}' не найден."
     else:
@@ -94,73 +114,49 @@ def login(username: str, password: str):
         if not user_model.verify_password(user_data_json["hashed_password"]):
                 return None, "Неверный пароль"
 
-        return user["user_id"], f"Вы вошли как '{username}'"
+        return user_data_json["user_id"], f"Вы вошли как '{username}'"
 
 
+@log_action("SHOW_PORTFOLIO", log=False)
 def show_portfolio(user_id: int, base_currency: str = None):
     """Показать портфель пользователя"""
     if base_currency is None:
         base_currency = DEFAULT_BASE_CURRENCY
         
-    exchange_rates_json = db.load_json(RATES_FILE)
+    exchange_rates_json = rates_cache.get()
     try:
-        exchange_rates_json = exchange_rates_json['pairs']
+        exchange_rates_json['pairs']
     except Exception as e:
-        return f"Ошибка чтения курсов: {e}. Выполните 'update-rates'."
-    base_key = f"{base_currency}_{DEFAULT_BASE_CURRENCY}"
-    if base_key not in exchange_rates_json and base_currency != DEFAULT_BASE_CURRENCY:
-        return f"Неизвестная базовая валюта '{base_currency}'"
+        raise RateUnavailableError(f"Ошибка чтения курсов: {e}. Выполните 'update-rates'.") from None
+    if not converter.knows(base_currency):
+        raise CurrencyNotFoundError(f"Неизвестная базовая валюта '{base_currency}'")
     
-    if base_currency == DEFAULT_BASE_CURRENCY:
-        base_rate = 1.0
-    else:
-        base_rate = exchange_rates_json[base_key]["rate"]
-    
-    portfolio = db.load_json(PORTFOLIOS_FILE)
-    
-    for i in portfolio:
-        if i["user_id"] == user_id:
-            user_data: dict = i
-            break
+    user_data = repo.get_portfolio(user_id)
+    if user_data is None:
+        raise UserNotFoundError(f'Портфель пользователя с user_id: {user_id} не найден.')
     
     user_id = user_data.get('user_id')
     wallets_map: dict = user_data.get('wallets', {})
     
     if wallets_map == {}:
         return "У вас пока нет валютных кошельков."
-    wallets = {}
-    
-    for currency_code, info in wallets_map.items():
-        balance_value = info.get('balance', 0.0)
-        wallets[currency_code] = Wallet(currency_code=currency_code,
-                                        balance=balance_value)
-    user_portfolio = Portfolio(user_id=user_id, wallets=wallets)
-
-    user_data = db.load_json(USERS_FILE)
-    username = None
-    for i in user_data:
-        if i["user_id"] == user_id:
-            username = i["username"]
-            break
+    user_portfolio = Portfolio.from_record(user_data)
+
+    user_record = repo.get_user(user_id)
+    username = user_record["username"] if user_record else None
     
     if not username:
-        return f'Пользователь с таким user_id: {user_id} не найден.'
+        raise UserNotFoundError(f'Пользователь с таким user_id: {user_id} не найден.')
     
     lines = [f"Портфель пользователя '{username}' (база: {base_currency}):"]
-    total = 0.0
-    for currency_code, wallet in user_portfolio.wallets.items():
-        if currency_code == DEFAULT_BASE_CURRENCY:
-            rate = 1.0
-        else:
-            rate_key = f"{currency_code}_{DEFAULT_BASE_CURRENCY}"
-            if rate_key in exchange_rates_json:
-                rate = exchange_rates_json[rate_key]["rate"]
-            else:
-                rate = 0.0
-        converted = wallet.balance * rate / base_rate
-        lines.append(f"- {currency_code}: {wallet.balance:.2f} "
-                     f"→ {converted:.2f} {base_currency}")
-        total += converted
+    codes, units, scales = user_portfolio.unit_arrays()
+    balances = units / scales
+    # все кошельки пересчитываются одной векторной операцией по матрице кросс-курсов
+    converted = converter.convert_many(balances, codes, base_currency)
+    for currency_code, balance, value in zip(codes, balances.tolist(), converted):
+        lines.append(f"- {currency_code}: {balance:.2f} "
+                     f"→ {value:.2f} {base_currency}")
+    total = float(converted.sum())
 
     lines.append("-" * 35)
     lines.append(f"ИТОГО: {total:.2f} {base_currency}")
@@ -168,13 +164,13 @@ def show_portfolio(user_id: int, base_currency: str = None):
     
     
 @log_action("BUY", verbose=True)
-def buy(user_id: int, currency_code: str, amount: str):
+def buy(user_id: int, currency_code: str, amount: float):
     """Функция покупки валют"""
-    exchange_rates_json = db.load_json(RATES_FILE)
+    exchange_rates_json = rates_cache.get()
     try:
         exchange_rates_json = exchange_rates_json['pairs']
     except Exception as e:
-        return f"Ошибка чтения курсов: {e}. Выполните 'update-rates'."
+        raise RateUnavailableError(f"Ошибка чтения курсов: {e}. Выполните 'update-rates'.") from None
     rate_key = f"{currency_code}_{DEFAULT_BASE_CURRENCY}"
     
     currency = get_currency(currency_code).get_display_info()
@@ -185,29 +181,34 @@ def buy(user_id: int, currency_code: str, amount: str):
         rate = 1.0
     else:
         if rate_key not in exchange_rates_json:
-            return f"Не удалось получить курс '{currency_code}→{DEFAULT_BASE_CURRENCY}'"
+            raise RateUnavailableError(f"Не удалось получить курс '{currency_code}→{DEFAULT_BASE_CURRENCY}'")
         rate = exchange_rates_json[rate_key]["rate"]
-    portfolios_json = db.load_json(PORTFOLIOS_FILE)
-    
-    for p in portfolios_json:
-        if p["user_id"] == user_id:
-            portfolio_data = p
+    for attempt in range(TRADE_RETRIES):
+        portfolio_data = repo.get_portfolio(user_id)
+        if portfolio_data is None:
+            raise UserNotFoundError(f'Портфель пользователя с user_id: {user_id} не найден.')
+
+        wallets_map: dict = portfolio_data.get("wallets", {})
+        wallet_record = wallets_map.get(currency_code, {})
+        old_balance = wallet_record.get("balance", 0.0)
+        wallet_obj = Wallet.from_trusted(currency_code, old_balance)
+        units = wallet_obj.to_units(amount)
+        wallet_obj.deposit(amount)
+        # в журнал, стоимость и сообщение идёт реально зачисленная сумма (в минимальных единицах)
+        traded = units / wallet_obj.scale
+
+        new_balance = wallet_obj.balance
+        try:
+            repo.apply_trade(user_id, currency_code, traded, rate, new_balance,
+                             expected_version=wallet_record.get("version", 0))
             break
-
-    wallets_map: dict = portfolio_data.get("wallets", {})
-    if currency_code not in wallets_map:
-        wallets_map[currency_code] = {"balance": 0.0}
-
-    old_balance = wallets_map[currency_code]["balance"]
-    wallet_obj = Wallet(currency_code, old_balance)
-    wallet_obj.deposit(amount)
-
-    new_balance = wallet_obj.balance
-    wallets_map[currency_code]["balance"] = new_balance
-    db.save_json(PORTFOLIOS_FILE, portfolios_json)
-    cost_base_currency = amount * rate
+        except ConcurrentUpdateError:
+            # кошелёк изменил другой процесс — пересчитываем от свежего баланса
+            if attempt == TRADE_RETRIES - 1:
+                raise
+    cost_base_currency = traded * rate
     return (
-        f"Покупка выполнена: {amount:.4f} {currency_code}"
+        f"Покупка выполнена: {traded:.4f} {currency_code}"
         f"по курсу {rate:.2f} {DEFAULT_BASE_CURRENCY}/{currency_code}\n"
         f"- {currency_code}: было {old_balance:.4f} → стало {new_balance:.4f}\n"
         f"Стоимость покупки: {cost_base_currency:,.2f} {DEFAULT_BASE_CURRENCY}")
@@ -216,11 +217,11 @@ def buy(user_id: int, currency_code: str, amount: str):
 @log_action("SELL", verbose=True)
 def sell(user_id: int, currency_code: str, amount: float):
     """Функция продажи валют"""
-    exchange_rates = db.load_json(RATES_FILE)
+    exchange_rates = rates_cache.get()
     try:
         exchange_rates = exchange_rates['pairs']
     except Exception as e:
-        return f"Ошибка чтения курсов: {e}. Выполните 'update-rates'."
+        raise RateUnavailableError(f"Ошибка чтения курсов: {e}. Выполните 'update-rates'.") from None
     rate_key = f"{currency_code}_{DEFAULT_BASE_CURRENCY}"
 
     currency = get_currency(currency_code).get_display_info()
@@ -231,57 +232,60 @@ def sell(user_id: int, currency_code: str, amount: float):
         rate = 1.0
     else:
         if rate_key not in exchange_rates:
-            return (f"Не удалось получить курс "
-                    f"'{currency_code}→{DEFAULT_BASE_CURRENCY}'")
+            raise RateUnavailableError(f"Не удалось получить курс "
+                                       f"'{currency_code}→{DEFAULT_BASE_CURRENCY}'")
         rate = exchange_rates[rate_key]["rate"]
 
-    portfolios_json = db.load_json(PORTFOLIOS_FILE)
-
-    for rec in portfolios_json:
-        if rec["user_id"] == user_id:
-            portfolio_record = rec
+    for attempt in range(TRADE_RETRIES):
+        portfolio_record = repo.get_portfolio(user_id)
+        if portfolio_record is None:
+            raise UserNotFoundError(f'Портфель пользователя с user_id: {user_id} не найден.')
+
+        wallets_map: dict = portfolio_record.get("wallets", {})
+        if currency_code not in wallets_map:
+            raise WalletNotFoundError(
+                f"У вас нет кошелька '{currency_code}'. "
+                f"Добавьте валюту: она создаётся автоматически при первой покупке.")
+        # нужен только кошелёк продаваемой валюты, остальные не трогаем
+        wallet = Wallet.from_trusted(currency_code, wallets_map[currency_code].get("balance", 0.0))
+        old_balance = wallet.balance
+
+        units = wallet.to_units(amount)
+        if units > wallet.units:
+            raise InsufficientFundsError(
+                f"Недостаточно средств: доступно {old_balance:.2f} {currency_code},"
+                f"требуется {amount:.2f}")
+
+        wallet.withdraw(amount)
+        # в журнал, выручку и сообщение идёт реально списанная сумма
+        traded = units / wallet.scale
+        new_balance = wallet.balance
+        try:
+            repo.apply_trade(user_id, currency_code, -traded, rate, new_balance,
+                             expected_version=wallets_map[currency_code].get("version", 0))
             break
-
-    wallets_map: dict = portfolio_record.get("wallets", {})
-    if currency_code not in wallets_map:
-        return (f"У вас нет кошелька '{currency_code}'. "
-               f"Добавьте валюту: она создаётся автоматически при первой покупке.")
-    wallets = {}
-    for code, info in wallets_map.items():
-        wallets[code] = Wallet(currency_code=code, balance=info.get("balance", 0.0))
-    wallet = wallets[currency_code]
-    old_balance = wallet.balance
-
-    if amount > old_balance:
-        raise InsufficientFundsError(
-            f"Недостаточно средств: доступно {old_balance:.2f} {currency_code},"
-            f"требуется {amount:.2f}")
-        
-    wallet.withdraw(amount)
-    new_balance = wallet.balance
-    portfolio_record["wallets"][currency_code]["balance"] = new_balance
-    db.save_json(PORTFOLIOS_FILE, portfolios_json)
-    profit_base_currency = amount * rate
+        except ConcurrentUpdateError:
+            # баланс мог уменьшиться, поэтому проверка средств тоже повторяется
+            if attempt == TRADE_RETRIES - 1:
+                raise
+    profit_base_currency = traded * rate
     return (
-        f"Продажа выполнена: {amount:.4f} {currency_code} "
+        f"Продажа выполнена: {traded:.4f} {currency_code} "
         f"по курсу {rate:.2f} {DEFAULT_BASE_CURRENCY}/{currency_code}\n"
         f"Изменения в портфеле:\n"
         f"- {currency_code}: было {old_balance:.2f} → стало {new_balance:.2f}\n"
         f"Оценочная выручка: {profit_base_currency:,.2f} {DEFAULT_BASE_CURRENCY}")
 
 
+@log_action("GET_RATE", log=False)
 def get_rate(from_code: str, to_code: str):
-    """Функция получения стоимости валюты относительно USD"""
-    exchange_rates_json = db.load_json(RATES_FILE)
+    """Функция получения курса любой пары (кросс-курс через базовую валюту)"""
+    exchange_rates_json = rates_cache.get()
     try:
-        exchange_rates = exchange_rates_json['pairs']
+        exchange_rates_json['pairs']
     except Exception as e:
-        return f"Ошибка чтения курсов: {e}. Выполните 'update-rates'."
-    key = f"{from_code}_{to_code}".upper()
-    if key not in exchange_rates:
-        raise CurrencyNotFoundError(f"Пара {key} не найдена")
-    rate_data = exchange_rates[key]
-    rate = rate_data['rate']
+        raise RateUnavailableError(f"Ошибка чтения курсов: {e}. Выполните 'update-rates'.") from None
+    rate = converter.rate(from_code, to_code)
 
     last_refresh = exchange_rates_json.get("last_refresh", "неизвестно")
     is_fresh_flag = is_fresh(last_refresh)
@@ -294,23 +298,29 @@ def get_rate(from_code: str, to_code: str):
     return msg
 
 
+@log_action("UPDATE_RATES", log=False)
 def update_rates(source: str = None) -> int:
     """Обновление курса валют"""
+    # HTTP-клиенты (requests) нужны только здесь, поэтому импортируются по требованию
+    from parser_service.config import ParserConfig
+    from parser_service.updater import RatesUpdater
+
     config = ParserConfig()
     updater = RatesUpdater(config)
     count = updater.run_update(source)
     return count
 
 
+@log_action("SHOW_RATES", log=False)
 def show_rates(currency: str = None, top_n: int = None) -> str:
     """Показать все курсы валют"""
-    cache = db.load_json(RATES_FILE)
+    cache = rates_cache.get()
     if not isinstance(cache, dict) or "pairs" not in cache:
-        return "Локальный кэш курсов пуст или повреждён. Выполните 'update-rates'."
+        raise RateUnavailableError("Локальный кэш курсов пуст или повреждён. Выполните 'update-rates'.")
     pairs = cache.get("pairs", {})
     last_refresh = cache.get("last_refresh", "N/A")
     if not pairs:
-        return "Локальный кэш курсов пуст. Выполните 'update-rates'."
+        raise RateUnavailableError("Локальный кэш курсов пуст. Выполните 'update-rates'.")
     filtered = {}
     if currency:
         currency = currency.upper()
@@ -319,7 +329,7 @@ def show_rates(currency: str = None, top_n: int = None) -> str:
             if pair_name.startswith(prefix):
                 filtered[pair_name] = data
         if not filtered:
-            return f"Курс для '{currency}' не найден в кеше."
+            raise RateUnavailableError(f"Курс для '{currency}' не найден в кеше.")
     else:
         filtered = pairs
 
@@ -339,4 +349,116 @@ def show_rates(currency: str = None, top_n: int = None) -> str:
     lines = [f"Курсы (обновлено: {last_refresh}):"]
     for pair, data in filtered.items():
         lines.append(f"- {pair}: {data['rate']:.6f} ({data['source']})")
-    return "\n".join(lines)
\ No newline at end of file
+    return "\n".join(lines)
+
+
+@log_action("RATE_HISTORY", log=False)
+def rate_history(from_code: str, to_code: str, period: str = "30d", step: str = None) -> str:
+    """История курса пары за период: точки или OHLC-бары с шагом step"""
+    from_code, to_code = from_code.upper(), to_code.upper()
+    get_currency(from_code)
+    get_currency(to_code)
+    period_seconds = parse_duration(period)
+    step_seconds = parse_duration(step) if step else None
+
+    storage = RatesStorage(RATES_FILE, EXCHANGE_RATE_FILE, HISTORY_DIR)
+    end = datetime.now()
+    start = end - timedelta(seconds=period_seconds)
+    # записи приходят генератором: в памяти только готовые строки вывода, а не вся история
+    rows = storage.history(f"{from_code}_{to_code}", start, end, step_seconds)
+    if step_seconds is None:
+        lines = [f"История {from_code}→{to_code} за {period}:"]
+        lines.extend(f"- {row['timestamp']}: {row['rate']:.6f} ({row['source']})" for row in rows)
+    else:
+        lines = [f"История {from_code}→{to_code} за {period} (шаг {step}):"]
+        lines.extend(f"- {bar['timestamp']}: O {bar['open']:.6f} H {bar['high']:.6f} "
+                     f"L {bar['low']:.6f} C {bar['close']:.6f} (точек: {bar['count']})" for bar in rows)
+    if len(lines) == 1:
+        return (f"Нет истории для {from_code}→{to_code} за {period}. "
+                f"Выполните 'update-rates'.")
+    return "\n".join(lines)
+
+
+@log_action("VALUATION_REPORT", log=False)
+def valuation_report(base_currency: str = None, out=None) -> str:
+    """Оценка всех портфелей в базовой валюте: CSV по пользователям и итог (AUM)"""
+    base_currency = (base_currency or DEFAULT_BASE_CURRENCY).upper()
+    exchange_rates_json = rates_cache.get()
+    try:
+        exchange_rates_json['pairs']
+    except Exception as e:
+        raise RateUnavailableError(f"Ошибка чтения курсов: {e}. Выполните 'update-rates'.") from None
+    if not converter.knows(base_currency):
+        raise CurrencyNotFoundError(f"Неизвестная базовая валюта '{base_currency}'")
+
+    # матрица балансов пользователи × валюты; валюты без курса не попадают в столбцы
+    rates = converter.rates_to(base_currency)
+    portfolios = repo.all_portfolios()
+    wallets_count = sum(len(record.get("wallets", {})) for record in portfolios)
+    user_ids, units, scales = Portfolio.units_matrix(portfolios, converter.codes)
+    totals = (units / scales) @ rates
+    # суммы по валютам считаются точно, в целых минимальных единицах
+    aum = sum(total / scale * rate for total, scale, rate
+              in zip(Portfolio.column_totals(units), scales.tolist(), rates.tolist()))
+
+    if out is not None:
+        usernames = repo.usernames()
+        writer = csv.writer(out)
+        writer.writerow(["user_id", "username", f"total_{base_currency}"])
+        for user_id, total in zip(user_ids.tolist(), totals.tolist()):
+            writer.writerow([user_id, usernames.get(user_id, ""), f"{total:.2f}"])
+        writer.writerow(["", "AUM", f"{aum:.2f}"])
+    return (f"Оценено портфелей: {len(portfolios)}, кошельков: {wallets_count}. "
+            f"AUM: {aum:,.2f} {base_currency}")
+
+
+def show_stats() -> str:
+    """Время выполнения команд за сессию: p50/p95/p99 по каждому действию"""
+    snapshot = latency_metrics.snapshot()
+    if not snapshot:
+        return "Статистики пока нет: выполните хотя бы одну команду."
+    lines = [f"{'действие':<17} {'вызовов':>7} {'ошибок':>6} {'p50, мс':>9} "
+             f"{'p95, мс':>9} {'p99, мс':>9} {'макс, мс':>9}"]
+    for action, stats in snapshot.items():
+        lines.append(f"{action:<17} {stats['count']:>7} {stats['errors']:>6} {stats['p50_ms']:>9.3f} "
+                     f"{stats['p95_ms']:>9.3f} {stats['p99_ms']:>9.3f} {stats['max_ms']:>9.3f}")
+    cache = rates_cache.stats()
+    lines.append(f"Кэш курсов: попаданий {cache['hits']}, загрузок {cache['misses']}")
+    return "\n".join(lines)
+
+
+def reshard_portfolios(shards: int) -> str:
+    """Перекладывает портфели в shards файлов; другие процессы в это время продолжают работать"""
+    try:
+        count, generation = repo.reshard(shards)
+    except ValueError as e:
+        return f"Ошибка: {e}"
+    return f"Портфели разложены по {count} шардам (поколение {generation})."
+
+
+def convert_data(data_format: str) -> str:
+    """Переписывает файлы данных в формате data_format (json, compact, msgpack)"""
+    try:
+        converted = db.convert_files(data_format)
+    except ValueError as e:
+        return f"Ошибка: {e}"
+    if not converted:
+        return "Нет файлов для конвертации."
+    lines = [f"Файлы данных переписаны в формате {data_format}:"]
+    for path, before, after in converted:
+        if after is None:
+            lines.append(f"- {path.relative_to(DATA_DIR)}: не удалось разобрать, файл не изменён")
+        else:
+            lines.append(f"- {path.relative_to(DATA_DIR)}: {before:,} → {after:,} байт")
+    if data_format != DATA_FORMAT:
+        lines.append(f"Новые записи пишутся в формате data_format из настроек ({DATA_FORMAT}).")
+    return "\n".join(lines)
+
+
+def save_stats(path=None) -> str | None:
+    """Дописывает снимок метрик в path или в metrics_file из настроек; None — некуда писать"""
+    path = path or METRICS_FILE
+    if not path:
+        return None
+    latency_metrics.flush(path)
+    return str(path)
@@ -27,4 +27,16 @@ def is_fresh(ts_str):
         return now_utc - ts_api < timedelta(seconds=RATES_TTL)
     except Exception as e:
         print(f"Ошибка парсинга времени: {e}")
-        return False
\ No newline at end of file
+        return False
+
+
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def parse_duration(value: str) -> int:
+    """Перевод строки вида 30d, 1h, 15m в секунды"""
+    value = value.strip().lower()
+    unit = value[-1:]
+    if unit not in DURATION_UNITS or not value[:-1].isdigit() or int(value[:-1]) <= 0:
+        raise ValueError(f"Неверный интервал '{value}'. Примеры: 30d, 12h, 15m")
+    return int(value[:-1]) * DURATION_UNITS[unit]
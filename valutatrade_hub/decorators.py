@@ -1,10 +1,27 @@
-import logging
+import time
 
-logger = logging.getLogger("actions")
+from valutatrade_hub.logging_config import actions_logger
+from valutatrade_hub.metrics import latency_metrics
 
-def log_action(action: str, *, verbose: bool = False):
+logger = actions_logger
+
+def log_action(action: str, *, verbose: bool = False, log: bool = True):
+    """Логирует действие и пишет время вызова в гистограмму latency_metrics.
+
+    log=False — только замер времени, без строки в actions.log
+    (для команд, которые ничего не меняют).
+    """
     def decorator(func):
         def wrapper(*args, **kwargs):
+            if not log:
+                start = time.perf_counter()
+                try:
+                    result = func(*args, **kwargs)
+                except Exception:
+                    latency_metrics.record(action, time.perf_counter() - start, ok=False)
+                    raise
+                latency_metrics.record(action, time.perf_counter() - start)
+                return result
             user_id = kwargs.get("user_id")
             if not user_id and len(args) > 0:
                 user_id = args[0]
@@ -14,21 +31,25 @@ def log_action(action: str, *, verbose: bool = False):
             currency_code = kwargs.get("currency_code")
             if not currency_code and len(args) > 1:
                 currency_code = args[1]
+            # запись — словарь полей; в JSON её превращает фоновый поток логирования
+            fields = {"action": action, "user_id": user_id,
+                      "currency": currency_code, "amount": amount}
+            start = time.perf_counter()
             try:
                 result = func(*args, **kwargs)
-                msg = (f"{action} user_id={user_id} "
-                       f"currency={currency_code} amount={amount} result=OK")
+                elapsed = time.perf_counter() - start
+                latency_metrics.record(action, elapsed)
+                fields.update(result="OK", duration_ms=round(elapsed * 1e3, 3))
                 if verbose and isinstance(result, str):
-                    clean_result = result.replace("\n", " ").replace("'", '"')
-                    msg += f" verbose={clean_result}"
-                logger.info(msg)
+                    fields["verbose"] = result
+                logger.info(action, extra={"fields": fields})
                 return result
             except Exception as e:
-                msg = (
-                    f"{action} user_id={user_id} currency={currency_code} "
-                    f"amount={amount} result=ERROR "
-                    f"error_type={type(e).__name__} message='{str(e)}'")
-                logger.error(msg)
+                elapsed = time.perf_counter() - start
+                latency_metrics.record(action, elapsed, ok=False)
+                fields.update(result="ERROR", duration_ms=round(elapsed * 1e3, 3),
+                              error_type=type(e).__name__, error=str(e))
+                logger.error(action, extra={"fields": fields})
                 raise
         return wrapper
-    return decorator
\ No newline at end of file
+    return decorator
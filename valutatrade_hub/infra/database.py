@@ -1,6 +1,530 @@
 import json
+import mmap
+import os
+import shutil
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 
+from constants import (
+    DATA_DIR,
+    DATA_FORMAT,
+    JOURNAL_CHECKPOINT_FILE,
+    LOCK_STRIPES,
+    LOCKS_DIR,
+    PORTFOLIOS_DIR,
+    SQLITE_BUSY_TIMEOUT,
+    SQLITE_FILE,
+    STORAGE_BACKEND,
+    TRADES_JOURNAL_FILE,
+)
+from core.exceptions import ConcurrentUpdateError
+from infra import serializers
+from infra.locks import FileLocks
+
+
+def read_json_lines(path: Path, offset: int = 0) -> tuple[list[dict], int]:
+    """Строки JSON Lines начиная с offset и смещение после последней целой строки"""
+    if not path.exists():
+        return [], offset
+    with path.open("rb") as f:
+        f.seek(offset)
+        chunk = f.read()
+    rows = []
+    end = chunk.rfind(b"\n") + 1
+    # недописанную строку (например, после падения процесса) пропускаем
+    for raw in chunk[:end].splitlines():
+        try:
+            rows.append(serializers.json_loads(raw))
+        except json.JSONDecodeError:
+            continue
+    return rows, offset + end
+
+
+def iter_lines(path: Path, offset: int = 0):
+    """Целые строки файла по одной (без перевода строки) через mmap, начиная со смещения offset.
+
+    Файл не читается в память целиком, поэтому память не зависит от его размера.
+    """
+    try:
+        f = path.open("rb")
+    except FileNotFoundError:
+        return
+    with f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = offset
+            while True:
+                end = mm.find(b"\n", pos)
+                if end < 0:
+                    # недописанную строку (например, после падения процесса) пропускаем
+                    return
+                yield mm[pos:end]
+                pos = end + 1
+
+
+def parse_json_line(raw: bytes) -> dict | None:
+    try:
+        return serializers.json_loads(raw)
+    except json.JSONDecodeError:
+        return None
+
+
+def shard_dir(portfolios_dir: Path, generation: int) -> Path:
+    """Каталог поколения шардов портфелей: portfolios/g001/"""
+    return Path(portfolios_dir) / f"g{generation:03d}"
+
+
+def dump_json_line(row: dict) -> str:
+    return json.dumps(row, separators=(",", ":"), ensure_ascii=False) + "\n"
+
+
+class JsonBackend:
+    """Хранение данных в файлах (по файлу на сущность)
+
+    Формат файлов задаёт data_format (json, compact, msgpack), при чтении он
+    определяется по содержимому, поэтому файлы разных форматов читаются вперемешку.
+    Файлы *.jsonl хранятся построчно и поддерживают дозапись.
+    """
+    name = "json"
+
+    def __init__(self, data_format: str = DATA_FORMAT):
+        self.serializer = serializers.get_serializer(data_format)
+        # path -> (прочитанное смещение, множество ключей) для дедупликации дозаписи
+        self._indexes: dict[Path, tuple[int, set]] = {}
+
+    def load(self, path: Path):
+        if path.suffix == ".jsonl":
+            return read_json_lines(path)[0]
+        if not path.exists():
+            return []
+        try:
+            raw = path.read_bytes()
+        except OSError as e:
+            print(f'С файлом есть проблемы: {e}')
+            return []
+        try:
+            return serializers.loads(raw)
+        except ValueError:
+            return []
+
+    def save(self, path: Path, data, serializer=None) -> None:
+        # у каждого писателя свой временный файл: общий .tmp перетирали параллельные записи
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with tmp.open("wb") as f:
+                if path.suffix == ".jsonl":
+                    f.write("".join(dump_json_line(row) for row in data or []).encode("utf-8"))
+                else:
+                    f.write((serializer or self.serializer).dumps(data))
+            os.replace(tmp, path)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+        self._indexes.pop(path, None)
+
+    def _key_index(self, path: Path, key: str) -> set:
+        """Ключи строк файла; дочитывает только то, что дописано после прошлого раза"""
+        offset, keys = self._indexes.get(path, (0, set()))
+        size = path.stat().st_size if path.exists() else 0
+        if size < offset:
+            # файл перезаписали целиком — индекс строим заново
+            offset, keys = 0, set()
+        if size > offset:
+            rows, offset = read_json_lines(path, offset)
+            keys.update(row[key] for row in rows if key in row)
+        self._indexes[path] = (offset, keys)
+        return keys
+
+    def append_rows(self, path: Path, rows, key: str) -> int:
+        keys = self._key_index(path, key)
+        fresh = {}
+        for row in rows:
+            if row[key] not in keys:
+                fresh[row[key]] = row
+        if not fresh:
+            return 0
+        payload = "".join(dump_json_line(row) for row in fresh.values()).encode("utf-8")
+        with path.open("ab") as f:
+            start = f.tell()
+            f.write(payload)
+            end = f.tell()
+        keys.update(fresh)
+        if self._indexes[path][0] == start:
+            self._indexes[path] = (end, keys)
+        return len(fresh)
+
+    # файлы и так пишутся целиком, пакетный режим нужен только журналу сделок
+    def begin_batch(self) -> None:
+        pass
+
+    def commit_batch(self) -> None:
+        pass
+
+    def end_batch(self) -> None:
+        pass
+
+    def stamp(self, path: Path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def insert_user(self, users_path: Path, portfolios_path: Path, user_record: dict) -> None:
+        portfolios = self.load(portfolios_path)
+        portfolios.append({"user_id": user_record["user_id"], "wallets": {}})
+        self.save(portfolios_path, portfolios)
+        users = self.load(users_path)
+        users.append(user_record)
+        self.save(users_path, users)
+
+    def upsert_wallet(self, portfolios_path: Path, user_id: int, currency_code: str,
+                      balance: float, expected_version: int | None = None) -> None:
+        portfolios = self.load(portfolios_path)
+        for record in portfolios:
+            if record["user_id"] == user_id:
+                break
+        else:
+            record = {"user_id": user_id, "wallets": {}}
+            portfolios.append(record)
+        wallet = record.setdefault("wallets", {}).setdefault(currency_code, {})
+        version = wallet.get("version", 0)
+        if expected_version is not None and version != expected_version:
+            raise ConcurrentUpdateError(f"Кошелёк {currency_code} пользователя {user_id} "
+                                        f"уже изменён (версия {version}, ожидалась {expected_version})")
+        wallet.update(balance=balance, version=version + 1)
+        self.save(portfolios_path, portfolios)
+
+
+class SqliteBackend:
+    """Хранение данных в SQLite (WAL): сделка обновляет одну строку"""
+    name = "sqlite"
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            username TEXT NOT NULL UNIQUE,
+            hashed_password TEXT NOT NULL,
+            salt TEXT NOT NULL,
+            registration_date TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS wallets (
+            user_id INTEGER NOT NULL,
+            currency_code TEXT NOT NULL,
+            balance REAL NOT NULL,
+            version INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, currency_code)
+        );
+        CREATE TABLE IF NOT EXISTS rates (
+            pair TEXT PRIMARY KEY,
+            rate REAL NOT NULL,
+            updated_at TEXT,
+            source TEXT
+        );
+        CREATE TABLE IF NOT EXISTS rate_history (
+            id TEXT PRIMARY KEY,
+            from_currency TEXT NOT NULL,
+            to_currency TEXT NOT NULL,
+            rate REAL NOT NULL,
+            timestamp TEXT NOT NULL,
+            source TEXT
+        );
+        CREATE INDEX IF NOT EXISTS rate_history_pair_time
+            ON rate_history (from_currency, to_currency, timestamp);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+        -- счётчик изменений каждой таблицы, растёт в той же транзакции, что и запись
+        CREATE TABLE IF NOT EXISTS table_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        );
+    """
+
+    # строк истории в одной странице iter_history
+    HISTORY_PAGE = 5000
+
+    # какой таблице соответствует бывший JSON-файл
+    TABLES = {
+        "users.json": "users",
+        "portfolios.json": "wallets",
+        "rates.json": "rates",
+        "exchange_rates.jsonl": "rate_history",
+        # старый формат истории, нужен только для переноса данных
+        "exchange_rates.json": "rate_history",
+    }
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        is_new = not self.db_path.exists()
+        # соединение общее для потоков, поэтому все обращения идут под блокировкой
+        self._lock = threading.RLock()
+        self._batch = False
+        # sqlite3 нужен только этому бэкенду, в JSON-режиме его импорт не нужен
+        import sqlite3
+
+        # пока другой процесс держит запись, ждём до SQLITE_BUSY_TIMEOUT, а не падаем с "database is locked"
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=SQLITE_BUSY_TIMEOUT)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute(f"PRAGMA busy_timeout = {int(SQLITE_BUSY_TIMEOUT * 1000)}")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(wallets)")}
+        if "version" not in columns:
+            # базы, созданные до версионирования кошельков
+            self._conn.execute("ALTER TABLE wallets ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        if is_new:
+            migrate_json_to_sqlite(self, self.db_path.parent)
+
+    @contextmanager
+    def _write(self):
+        # в пакетном режиме фиксация транзакции откладывается до commit_batch
+        if self._batch:
+            yield
+        else:
+            with self._conn:
+                yield
+
+    def begin_batch(self) -> None:
+        with self._lock:
+            self._batch = True
+
+    def commit_batch(self) -> None:
+        with self._lock:
+            self._conn.commit()
+
+    def end_batch(self) -> None:
+        with self._lock:
+            self._conn.commit()
+            self._batch = False
+
+    def _table(self, path: Path) -> str:
+        name = Path(path).name
+        if name not in self.TABLES:
+            raise ValueError(f"Нет таблицы для файла {name}")
+        return self.TABLES[name]
+
+    def load(self, path: Path):
+        table = self._table(path)
+        with self._lock:
+            if table == "users":
+                rows = self._conn.execute("SELECT * FROM users ORDER BY user_id")
+                return [dict(r) for r in rows]
+            if table == "wallets":
+                portfolios = {r["user_id"]: {"user_id": r["user_id"], "wallets": {}}
+                              for r in self._conn.execute("SELECT user_id FROM users ORDER BY user_id")}
+                for r in self._conn.execute("SELECT * FROM wallets"):
+                    record = portfolios.setdefault(r["user_id"], {"user_id": r["user_id"], "wallets": {}})
+                    record["wallets"][r["currency_code"]] = {"balance": r["balance"], "version": r["version"]}
+                return list(portfolios.values())
+            if table == "rates":
+                pairs = {r["pair"]: {"rate": r["rate"], "updated_at": r["updated_at"], "source": r["source"]}
+                         for r in self._conn.execute("SELECT * FROM rates")}
+                last_refresh = self._get_meta("last_refresh")
+                if not pairs and last_refresh is None:
+                    return []
+                return {"pairs": pairs, "last_refresh": last_refresh or "неизвестно"}
+            rows = self._conn.execute("SELECT * FROM rate_history ORDER BY timestamp, id")
+            return [dict(r) for r in rows]
+
+    def save(self, path: Path, data) -> None:
+        """Полная замена содержимого таблицы (аналог перезаписи файла)"""
+        table = self._table(path)
+        with self._lock, self._write():
+            self._bump(table)
+            if table == "users":
+                # портфели строятся по списку пользователей, поэтому они тоже меняются
+                self._bump("wallets")
+                self._conn.execute("DELETE FROM users")
+                self._insert_users(data)
+            elif table == "wallets":
+                self._conn.execute("DELETE FROM wallets")
+                self._insert_wallets(data)
+            elif table == "rates":
+                self._conn.execute("DELETE FROM rates")
+                self._insert_rates(data)
+            else:
+                self._conn.execute("DELETE FROM rate_history")
+                self._insert_history(data)
+
+    def stamp(self, path: Path):
+        # счётчик своей таблицы, а не PRAGMA data_version: та меняется от любой чужой
+        # записи, и сделка другого процесса сбрасывала бы кэши пользователей и курсов
+        table = self._table(path)
+        with self._lock:
+            row = self._conn.execute("SELECT version FROM table_versions WHERE name = ?", (table,)).fetchone()
+        return row["version"] if row else 0
+
+    def _bump(self, table: str) -> None:
+        self._conn.execute("INSERT INTO table_versions (name, version) VALUES (?, 1) "
+                           "ON CONFLICT(name) DO UPDATE SET version = version + 1", (table,))
+
+    def load_portfolio(self, portfolios_path: Path, user_id: int) -> dict | None:
+        """Портфель одного пользователя прямо из таблицы; None — пользователя нет"""
+        self._table(portfolios_path)
+        with self._lock:
+            rows = self._conn.execute("SELECT currency_code, balance, version FROM wallets WHERE user_id = ?",
+                                      (user_id,)).fetchall()
+            if not rows and self._conn.execute("SELECT 1 FROM users WHERE user_id = ?",
+                                               (user_id,)).fetchone() is None:
+                return None
+        return {"user_id": user_id,
+                "wallets": {r["currency_code"]: {"balance": r["balance"], "version": r["version"]}
+                            for r in rows}}
+
+    def insert_user(self, users_path: Path, portfolios_path: Path, user_record: dict) -> None:
+        import sqlite3
+
+        with self._lock, self._write():
+            self._bump("users")
+            self._bump("wallets")
+            try:
+                self._insert_users([user_record])
+            except sqlite3.IntegrityError as e:
+                # user_id или username уже занял другой процесс
+                raise ConcurrentUpdateError(f"Пользователь уже существует: {e}") from e
+
+    def upsert_wallet(self, portfolios_path: Path, user_id: int, currency_code: str,
+                      balance: float, expected_version: int | None = None) -> None:
+        with self._lock, self._write():
+            self._bump("wallets")
+            if expected_version is None:
+                self._conn.execute(
+                    "INSERT INTO wallets (user_id, currency_code, balance, version) VALUES (?, ?, ?, 1) "
+                    "ON CONFLICT(user_id, currency_code) DO UPDATE "
+                    "SET balance = excluded.balance, version = wallets.version + 1",
+                    (user_id, currency_code, balance))
+                return
+            # оптимистичная проверка: строка меняется, только если версия не сдвинулась
+            cursor = self._conn.execute(
+                "INSERT INTO wallets (user_id, currency_code, balance, version) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(user_id, currency_code) DO UPDATE "
+                "SET balance = excluded.balance, version = excluded.version "
+                "WHERE wallets.version = ?",
+                (user_id, currency_code, balance, expected_version + 1, expected_version))
+            if cursor.rowcount == 0:
+                raise ConcurrentUpdateError(f"Кошелёк {currency_code} пользователя {user_id} "
+                                            f"уже изменён (ожидалась версия {expected_version})")
+
+    def append_rows(self, path: Path, rows, key: str) -> int:
+        table = self._table(path)
+        if table != "rate_history":
+            raise ValueError(f"Дозапись не поддерживается для таблицы {table}")
+        with self._lock, self._write():
+            self._bump(table)
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO rate_history (id, from_currency, to_currency, rate, timestamp, source) "
+                "VALUES (:id, :from_currency, :to_currency, :rate, :timestamp, :source)",
+                rows)
+            return self._conn.total_changes - before
+
+    def iter_history(self, path: Path, from_currency: str, to_currency: str, start: str, end: str):
+        """Записи пары по страницам HISTORY_PAGE строк.
+
+        Страницы идут по индексу (пара, время, rowid) от последней прочитанной строки,
+        поэтому соединение не держит открытый курсор, пока вызывающий обрабатывает записи.
+        """
+        self._table(path)
+        last_time, last_rowid = start, 0
+        while True:
+            with self._lock:
+                page = self._conn.execute(
+                    "SELECT rowid, id, from_currency, to_currency, rate, timestamp, source FROM rate_history "
+                    "WHERE from_currency = ? AND to_currency = ? "
+                    "AND (timestamp, rowid) > (?, ?) AND timestamp <= ? "
+                    "ORDER BY timestamp, rowid LIMIT ?",
+                    (from_currency, to_currency, last_time, last_rowid, end, self.HISTORY_PAGE)).fetchall()
+            for row in page:
+                record = dict(row)
+                del record["rowid"]
+                yield record
+            if len(page) < self.HISTORY_PAGE:
+                return
+            last_time, last_rowid = page[-1]["timestamp"], page[-1]["rowid"]
+
+    def _get_meta(self, key: str):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    def _insert_users(self, users) -> None:
+        self._conn.executemany(
+            "INSERT INTO users (user_id, username, hashed_password, salt, registration_date) "
+            "VALUES (:user_id, :username, :hashed_password, :salt, :registration_date)",
+            users or [])
+
+    def _insert_wallets(self, portfolios) -> None:
+        self._conn.executemany(
+            "INSERT INTO wallets (user_id, currency_code, balance, version) VALUES (?, ?, ?, ?)",
+            ((p["user_id"], code, info.get("balance", 0.0), info.get("version", 0))
+             for p in portfolios or [] for code, info in p.get("wallets", {}).items()))
+
+    def _insert_rates(self, data) -> None:
+        if not isinstance(data, dict):
+            return
+        self._conn.executemany(
+            "INSERT INTO rates (pair, rate, updated_at, source) VALUES (?, ?, ?, ?)",
+            ((pair, info["rate"], info.get("updated_at"), info.get("source"))
+             for pair, info in data.get("pairs", {}).items()))
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('last_refresh', ?)",
+                           (data.get("last_refresh"),))
+
+    def _insert_history(self, history) -> None:
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO rate_history (id, from_currency, to_currency, rate, timestamp, source) "
+            "VALUES (:id, :from_currency, :to_currency, :rate, :timestamp, :source)",
+            history or [])
+
+
+def migrate_json_to_sqlite(backend: SqliteBackend, json_dir: Path) -> None:
+    """Разовый перенос данных из JSON-файлов каталога data в SQLite"""
+    # журнал импортирует этот модуль, поэтому импортируем его здесь
+    from infra.journal import TradeJournal
+
+    json_dir = Path(json_dir)
+    source = JsonBackend()
+    for filename, table in SqliteBackend.TABLES.items():
+        if table == "wallets":
+            continue
+        path = json_dir / filename
+        data = source.load(path)
+        if not data:
+            continue
+        if table == "rate_history":
+            # история может лежать в двух форматах, поэтому дописываем, а не заменяем
+            backend.append_rows(path, data, "id")
+        else:
+            backend.save(path, data)
+    # история в JSON-режиме разложена по партициям history/<ПАРА>/<ГГГГ-ММ>.jsonl
+    history_table = json_dir / "exchange_rates.jsonl"
+    for partition in sorted(json_dir.glob("history/*/*.jsonl")):
+        backend.append_rows(history_table, read_json_lines(partition)[0], "id")
+    # портфели могут быть разложены по шардам portfolios/gNNN/*.json
+    manifest = source.load(json_dir / "portfolios" / "manifest.json")
+    if manifest:
+        shards = sorted(shard_dir(json_dir / "portfolios", manifest["generation"]).glob("*.json"))
+        portfolios = [record for path in shards for record in source.load(path)]
+    else:
+        portfolios = source.load(json_dir / "portfolios.json") or []
+    # в снимке нет сделок, записанных в журнал после контрольной точки
+    journal = TradeJournal(json_dir / TRADES_JOURNAL_FILE.name, json_dir / JOURNAL_CHECKPOINT_FILE.name)
+    portfolios = journal.replay(portfolios)
+    if not portfolios:
+        return
+    portfolios_file = json_dir / "portfolios.json"
+    backend.save(portfolios_file, portfolios)
+    expected = {(p["user_id"], code): info.get("balance", 0.0)
+                for p in portfolios for code, info in p.get("wallets", {}).items()}
+    migrated = {(p["user_id"], code): info["balance"]
+                for p in backend.load(portfolios_file) for code, info in p["wallets"].items()}
+    if migrated != expected:
+        raise RuntimeError("Перенос портфелей в SQLite не сошёлся с JSON-данными: "
+                           f"{len(expected)} кошельков в JSON, {len(migrated)} в базе")
+
 
 class DatabaseManager:
     """Синглтон для работы с БД"""
@@ -10,23 +534,152 @@ class DatabaseManager:
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
+            cls._instance._backend = cls._create_backend()
+            cls._instance._locks = FileLocks(LOCKS_DIR, LOCK_STRIPES)
         return cls._instance
 
+    @staticmethod
+    def _create_backend():
+        # бэкенд выбирается через storage_backend в [tool.valutatrade]
+        if STORAGE_BACKEND == "sqlite":
+            return SqliteBackend(SQLITE_FILE)
+        if STORAGE_BACKEND != "json":
+            raise ValueError(f"Неизвестный storage_backend: {STORAGE_BACKEND}")
+        return JsonBackend()
+
+    @property
+    def backend(self) -> str:
+        return self._backend.name
+
+    def _path(self, filename) -> Path:
+        return self.BASE_DIR / "data" / filename
+
     def load_json(self, filename: str):
-        path = self.BASE_DIR / "data" / filename
-        if not path.exists():
-            return []
-        try:
-            with path.open("r", encoding="utf-8") as f:
-                try:
-                    return json.load(f)
-                except json.JSONDecodeError:
-                    return []
-        except Exception as e:
-            print(f'С файлом есть проблемы: {e}')
-            return []
+        return self._backend.load(self._path(filename))
 
     def save_json(self, filename: str, data) -> None:
-        path = self.BASE_DIR / "data" / filename
-        with path.open("w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
+        self._backend.save(self._path(filename), data)
+
+    def append_rows(self, filename: str, rows, key: str = "id") -> int:
+        """Дописывает строки, пропуская уже сохранённые ключи; возвращает число новых"""
+        return self._backend.append_rows(self._path(filename), rows, key)
+
+    def iter_history(self, filename: str, from_currency: str, to_currency: str, start: str, end: str):
+        """Записи истории одной пары за интервал [start, end] (ISO-строки) по возрастанию времени.
+
+        Генератор: записи читаются по мере обработки, а не списком целиком.
+        Только для SQLite: в JSON-режиме историю читает RateHistoryStore.scan.
+        """
+        return self._backend.iter_history(self._path(filename), from_currency, to_currency, start, end)
+
+    def stamp(self, filename: str):
+        """Метка версии данных: меняется, когда их изменил другой процесс"""
+        return self._backend.stamp(self._path(filename))
+
+    def load_portfolio(self, portfolios_file, user_id: int) -> dict | None:
+        """Портфель одного пользователя без чтения всей таблицы (только SQLite)"""
+        return self._backend.load_portfolio(self._path(portfolios_file), user_id)
+
+    def insert_user(self, users_file, portfolios_file, user_record: dict) -> None:
+        """Добавляет пользователя с пустым портфелем"""
+        self._backend.insert_user(self._path(users_file), self._path(portfolios_file), user_record)
+
+    def upsert_wallet(self, portfolios_file, user_id: int, currency_code: str, balance: float,
+                      expected_version: int | None = None) -> None:
+        """Записывает баланс одного кошелька.
+
+        С expected_version запись проходит, только если версия кошелька не изменилась,
+        иначе ConcurrentUpdateError.
+        """
+        self._backend.upsert_wallet(self._path(portfolios_file), user_id, currency_code,
+                                    balance, expected_version)
+
+    def portfolio_layout(self) -> tuple[int, int]:
+        """Раскладка портфелей на диске: (число шардов, поколение).
+
+        Поколение 0 — один файл portfolios.json (и всегда в SQLite, где сделка и так
+        меняет одну строку). Шард пользователя — user_id % число шардов.
+        """
+        if self.backend != "json":
+            return 1, 0
+        manifest = self._backend.load(PORTFOLIOS_DIR / "manifest.json")
+        if not manifest:
+            return 1, 0
+        return manifest["shards"], manifest["generation"]
+
+    def portfolio_layout_stamp(self):
+        """Метка манифеста шардов: меняется при перешардировании"""
+        return self._backend.stamp(PORTFOLIOS_DIR / "manifest.json")
+
+    def portfolio_shard_file(self, shard: int, layout: tuple[int, int]) -> Path:
+        return shard_dir(PORTFOLIOS_DIR, layout[1]) / f"{shard:03d}.json"
+
+    def save_portfolio_layout(self, shards: int, portfolios) -> tuple[int, int]:
+        """Пишет портфели в новое поколение из shards файлов и переключает на него манифест.
+
+        Вызывать под замком portfolios. Предыдущее поколение остаётся на диске:
+        его ещё могут дочитывать процессы, не заметившие смену манифеста.
+        """
+        if self.backend != "json":
+            raise ValueError("Шардирование портфелей поддерживается только для storage_backend = \"json\"")
+        if shards < 1:
+            raise ValueError("Число шардов должно быть положительным")
+        generation = self.portfolio_layout()[1] + 1
+        layout = (shards, generation)
+        groups = [[] for _ in range(shards)]
+        for record in portfolios:
+            groups[record["user_id"] % shards].append(record)
+        shard_dir(PORTFOLIOS_DIR, generation).mkdir(parents=True, exist_ok=True)
+        for shard, records in enumerate(groups):
+            self._backend.save(self.portfolio_shard_file(shard, layout), records)
+        # манифест пишется последним: до этого все видят старую раскладку целиком
+        self._backend.save(PORTFOLIOS_DIR / "manifest.json", {"shards": shards, "generation": generation})
+        for old in PORTFOLIOS_DIR.glob("g*"):
+            if old.is_dir() and old.name < shard_dir(PORTFOLIOS_DIR, generation - 1).name:
+                shutil.rmtree(old, ignore_errors=True)
+        return layout
+
+    def convert_files(self, data_format: str) -> list[tuple[Path, int, int | None]]:
+        """Переписывает файлы данных (пользователи, курсы, портфели) в формате data_format.
+
+        Возвращает (файл, байт до, байт после); None — файл не разобрался и оставлен как есть.
+        Регистрации и сжатие журнала на это время ждут замков users и portfolios.
+        """
+        if self.backend != "json":
+            raise ValueError("Конвертация файлов нужна только для storage_backend = \"json\"")
+        serializer = serializers.get_serializer(data_format)
+        paths = [DATA_DIR / name for name in SqliteBackend.TABLES if name.endswith(".json")]
+        paths += sorted(PORTFOLIOS_DIR.glob("**/*.json"))
+        converted = []
+        with self.lock("users"), self.lock("portfolios"):
+            for path in paths:
+                raw = path.read_bytes() if path.exists() else b""
+                if not raw:
+                    continue
+                try:
+                    data = serializers.loads(raw)
+                except ValueError:
+                    converted.append((path, len(raw), None))
+                    continue
+                self._backend.save(path, data, serializer)
+                converted.append((path, len(raw), path.stat().st_size))
+        return converted
+
+    def lock(self, name: str):
+        """Блокировка между процессами по имени (users, portfolios, ...)"""
+        return self._locks.lock(name)
+
+    def user_lock(self, user_id: int):
+        """Блокировка пользователя: замок общий для user_id с одинаковым остатком от деления"""
+        return self._locks.user_lock(user_id)
+
+    def begin_batch(self) -> None:
+        """Начинает пакет: записи копятся до commit_batch (групповая фиксация)"""
+        self._backend.begin_batch()
+
+    def commit_batch(self) -> None:
+        """Фиксирует всё, что записано с начала пакета или прошлой фиксации"""
+        self._backend.commit_batch()
+
+    def end_batch(self) -> None:
+        self._backend.end_batch()
@@ -0,0 +1,44 @@
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировка между процессами недоступна
+    fcntl = None
+
+
+class FileLocks:
+    """Рекомендательные (flock) блокировки между процессами по имени.
+
+    Пользователи раскладываются по stripes файлам-замкам (user_id % stripes),
+    поэтому сделки разных пользователей почти никогда не ждут друг друга,
+    а число файлов в locks/ не растёт с числом пользователей.
+    """
+    def __init__(self, root, stripes: int):
+        self.root = Path(root)
+        self.stripes = stripes
+        self._ready = False
+
+    def _path(self, name: str) -> Path:
+        if not self._ready:
+            self.root.mkdir(parents=True, exist_ok=True)
+            self._ready = True
+        return self.root / f"{name}.lock"
+
+    @contextmanager
+    def lock(self, name: str):
+        """Эксклюзивная блокировка name; не реентерабельна даже в одном потоке"""
+        # flock привязан к открытому файлу, поэтому потоки одного процесса
+        # с разными дескрипторами тоже ждут друг друга
+        fd = os.open(self._path(name), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            # закрытие дескриптора снимает flock
+            os.close(fd)
+
+    def user_lock(self, user_id: int):
+        return self.lock(f"user-{user_id % self.stripes:03d}")
@@ -0,0 +1,40 @@
+import time
+
+from constants import RATES_FILE, RATES_TTL
+from infra.database import DatabaseManager
+
+
+class RatesCache:
+    """Разобранный rates.json в памяти процесса.
+
+    Перечитывается, только если данные поменялись (метка DatabaseManager.stamp)
+    или с последней загрузки прошло больше ttl секунд.
+    """
+    def __init__(self, db: DatabaseManager, path=RATES_FILE, ttl: int = RATES_TTL):
+        self.db = db
+        self.path = path
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = None
+        self._stamp = None
+        self._loaded_at = 0.0
+
+    def get(self):
+        """Содержимое кэша курсов ({"pairs": ..., "last_refresh": ...} или [] если пусто)"""
+        stamp = self.db.stamp(self.path)
+        now = time.monotonic()
+        if self._data is not None and stamp == self._stamp and now - self._loaded_at < self.ttl:
+            self.hits += 1
+            return self._data
+        self.misses += 1
+        self._data = self.db.load_json(self.path)
+        self._stamp = stamp
+        self._loaded_at = now
+        return self._data
+
+    def invalidate(self) -> None:
+        self._data = None
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
@@ -0,0 +1,361 @@
+from contextlib import contextmanager
+
+from constants import JOURNAL_COMPACT_EVERY, PORTFOLIO_SHARDS, PORTFOLIOS_FILE, USERS_FILE
+from core.exceptions import ConcurrentUpdateError
+from infra.database import DatabaseManager
+from infra.journal import TradeJournal
+
+
+class UserRepository:
+    """Пользователи и портфели в памяти с индексами по user_id и username.
+
+    Портфели в JSON-режиме разложены по шардам (DatabaseManager.portfolio_layout):
+    читается только шард нужного пользователя, сжатие журнала переписывает только
+    шарды, затронутые сделками.
+
+    Записи защищены от параллельных процессов: сделка идёт под замком пользователя
+    (DatabaseManager.user_lock) и проверяет версию кошелька, регистрация — под замком
+    users, снимок портфелей — под замком portfolios (порядок захвата: users/пользователь → portfolios).
+    """
+    def __init__(self, db: DatabaseManager, users_file=USERS_FILE,
+                 portfolios_file=PORTFOLIOS_FILE, journal: TradeJournal | None = None,
+                 compact_every: int = JOURNAL_COMPACT_EVERY, shards: int = PORTFOLIO_SHARDS):
+        self.db = db
+        self.users_file = users_file
+        self.portfolios_file = portfolios_file
+        self.journal = journal or TradeJournal()
+        self.compact_every = compact_every
+        # сколько шардов создать при первом сжатии, если портфели ещё в одном файле
+        self.shards = shards
+        self._users: list[dict] = []
+        self._users_by_id: dict[int, dict] = {}
+        self._users_by_name: dict[str, dict] = {}
+        self._stamps: dict[str, tuple | None] = {}
+        # раскладка портфелей на диске; None — перечитать при следующем обращении
+        self._layout: tuple[int, int] | None = None
+        self._layout_stamp = None
+        # загруженные шарды: номер → {user_id: портфель} и метка файла на момент чтения
+        self._shards: dict[int, dict[int, dict]] = {}
+        self._shard_stamps: dict[int, tuple | None] = {}
+        # записи журнала для ещё не загруженных шардов: шард → {user_id: {код: (баланс, версия)}}
+        self._overlay: dict[int, dict[int, dict[str, tuple]]] = {}
+        # шарды, изменённые журналом после контрольной точки
+        self._dirty: set[int] = set()
+        # смещение журнала, до которого сделки уже применены в памяти
+        self._journal_offset = 0
+        # сделок в журнале после последнего снимка портфелей
+        self._pending = 0
+        self._batching = False
+
+    @property
+    def _replays_journal(self) -> bool:
+        # в SQLite балансы и так обновляются построчно, журнал там только для аудита
+        return self.db.backend == "json"
+
+    def _is_stale(self, path) -> bool:
+        # метка от DatabaseManager дешёвая: stat файла или счётчик изменений таблицы в SQLite
+        key = str(path)
+        return key not in self._stamps or self._stamps[key] != self.db.stamp(path)
+
+    def _remember(self, path):
+        self._stamps[str(path)] = self.db.stamp(path)
+
+    def _load_users(self):
+        self._users = self.db.load_json(self.users_file) or []
+        self._users_by_id = {u["user_id"]: u for u in self._users}
+        self._users_by_name = {u["username"]: u for u in self._users}
+        self._remember(self.users_file)
+
+    def _ensure_users(self):
+        if self._is_stale(self.users_file):
+            self._load_users()
+
+    def _shard(self, user_id: int) -> int:
+        return user_id % self._layout[0]
+
+    def _shard_file(self, shard: int):
+        if self._layout[1] == 0:
+            return self.portfolios_file
+        return self.db.portfolio_shard_file(shard, self._layout)
+
+    def _reset_portfolios(self):
+        """Забывает загруженные шарды и перечитывает хвост журнала после контрольной точки"""
+        self._shards = {}
+        self._shard_stamps = {}
+        self._overlay = {}
+        self._dirty = set()
+        self._pending = 0
+        if not self._replays_journal:
+            self._layout = self.db.portfolio_layout()
+            return
+        # порядок обратный записи при сжатии (шарды → манифест → контрольная точка):
+        # всё, что прочитаем дальше, не старше контрольной точки
+        self._journal_offset = self.journal.get_checkpoint()
+        self._layout_stamp = self.db.portfolio_layout_stamp()
+        self._layout = self.db.portfolio_layout()
+        self._replay_journal()
+
+    def _check_layout(self):
+        if self._layout is None or (self._replays_journal
+                                    and self._layout_stamp != self.db.portfolio_layout_stamp()):
+            # первое обращение или другой процесс перешардировал портфели
+            self._reset_portfolios()
+
+    def _load_shard(self, shard: int):
+        path = self._shard_file(shard)
+        # метка до чтения: запись, случившаяся во время чтения, будет замечена позже
+        stamp = self.db.stamp(path)
+        records = self.db.load_json(path) or []
+        self._shards[shard] = {r["user_id"]: r for r in records}
+        self._shard_stamps[shard] = stamp
+        for user_id, wallets in self._overlay.pop(shard, {}).items():
+            for code, (balance, version) in wallets.items():
+                self._set_wallet(user_id, code, balance, version)
+
+    def _ensure_shard(self, shard: int):
+        if shard in self._shards and self._shard_stamps[shard] != self.db.stamp(self._shard_file(shard)):
+            # шард переписал другой процесс (сжатие или регистрация)
+            self._reset_portfolios()
+        if shard not in self._shards:
+            self._load_shard(shard)
+
+    def _catch_up(self):
+        if self._replays_journal and self.journal.size() != self._journal_offset:
+            # журнал дописал другой процесс — догоняем только новые строки
+            self._replay_journal()
+
+    def _refresh_all(self):
+        """Проверяет все загруженные шарды и дочитывает журнал"""
+        self._check_layout()
+        if any(self.db.stamp(self._shard_file(shard)) != stamp
+               for shard, stamp in self._shard_stamps.items()):
+            self._reset_portfolios()
+        self._catch_up()
+
+    def _replay_journal(self):
+        entries, self._journal_offset = self.journal.read_from(self._journal_offset)
+        for entry in entries:
+            user_id = entry["user_id"]
+            shard = self._shard(user_id)
+            self._dirty.add(shard)
+            if shard in self._shards:
+                self._set_wallet(user_id, entry["currency"], entry["balance"], entry.get("version", 0))
+            else:
+                # шард прочитаем, только когда он понадобится
+                wallets = self._overlay.setdefault(shard, {}).setdefault(user_id, {})
+                wallets[entry["currency"]] = (entry["balance"], entry.get("version", 0))
+        self._pending += len(entries)
+
+    def get_user(self, user_id: int) -> dict | None:
+        self._ensure_users()
+        return self._users_by_id.get(user_id)
+
+    def get_user_by_name(self, username: str) -> dict | None:
+        self._ensure_users()
+        return self._users_by_name.get(username)
+
+    def get_portfolio(self, user_id: int) -> dict | None:
+        if not self._replays_journal:
+            # одна строка по индексу дешевле проверки кэша: чужая сделка не заставит перечитать таблицу
+            return self.db.load_portfolio(self.portfolios_file, user_id)
+        self._check_layout()
+        self._ensure_shard(self._shard(user_id))
+        if self._shard(user_id) not in self._shards:
+            # пока перечитывали шард, другой процесс сменил раскладку
+            self._load_shard(self._shard(user_id))
+        self._catch_up()
+        records = self._shards[self._shard(user_id)]
+        portfolio = records.get(user_id)
+        if portfolio is None and self.get_user(user_id) is not None:
+            # регистрация не пишет снимок: портфель без сделок пуст, как в SQLite
+            portfolio = records[user_id] = {"user_id": user_id, "wallets": {}}
+        return portfolio
+
+    def usernames(self) -> dict[int, str]:
+        """Соответствие user_id → username для массовых отчётов"""
+        self._ensure_users()
+        return {user_id: u["username"] for user_id, u in self._users_by_id.items()}
+
+    def all_portfolios(self) -> list[dict]:
+        """Все портфели по возрастанию user_id (записи только для чтения)"""
+        self._refresh_all()
+        for shard in range(self._layout[0]):
+            self._ensure_shard(shard)
+        portfolios = [record for records in self._shards.values() for record in records.values()]
+        self._ensure_users()
+        known = {record["user_id"] for record in portfolios}
+        # пользователи без сделок после регистрации в снимок ещё не попали
+        portfolios.extend({"user_id": user_id, "wallets": {}}
+                          for user_id in self._users_by_id if user_id not in known)
+        portfolios.sort(key=lambda record: record["user_id"])
+        return portfolios
+
+    def next_user_id(self) -> int:
+        self._ensure_users()
+        return max(self._users_by_id, default=0) + 1
+
+    def add_user(self, user_record: dict) -> None:
+        """Добавляет пользователя; его портфель пуст, пока не было сделок.
+
+        ConcurrentUpdateError — username или user_id успел занять другой процесс.
+        """
+        user_id = user_record["user_id"]
+        if self.db.backend == "sqlite":
+            # уникальность проверяет сама база
+            self._ensure_users()
+            fresh = not self._is_stale(self.users_file)
+            self.db.insert_user(self.users_file, self.portfolios_file, user_record)
+            self._add_user_to_memory(user_record)
+            if fresh:
+                self._remember(self.users_file)
+            return
+        # пишется только users.json: портфель нового пользователя пуст, в снимок он попадёт
+        # при сжатии после первой сделки (журнал), поэтому в пакете регистрация не переписывает шарды
+        with self.db.lock("users"):
+            # перечитываем без проверки метки: две записи за один тик mtime с одинаковым
+            # размером файла дают ту же метку, и чужой пользователь затёрся бы
+            self._load_users()
+            if user_record["username"] in self._users_by_name or user_id in self._users_by_id:
+                raise ConcurrentUpdateError(f"Пользователь '{user_record['username']}' "
+                                            f"или id={user_id} уже занят")
+            self._add_user_to_memory(user_record)
+            self.db.save_json(self.users_file, self._users)
+            self._remember(self.users_file)
+
+    def _add_user_to_memory(self, user_record: dict) -> None:
+        self._users.append(user_record)
+        self._users_by_id[user_record["user_id"]] = user_record
+        self._users_by_name[user_record["username"]] = user_record
+
+    def apply_trade(self, user_id: int, currency_code: str, delta: float,
+                    rate: float, balance: float, expected_version: int | None = None) -> None:
+        """Фиксирует сделку: новый баланс кошелька и запись в журнале.
+
+        expected_version — версия кошелька, по которой посчитан balance; если другой
+        процесс успел его изменить, будет ConcurrentUpdateError и данные перечитаются.
+        """
+        with self.db.user_lock(user_id):
+            try:
+                self._apply_trade(user_id, currency_code, delta, rate, balance, expected_version)
+            except ConcurrentUpdateError:
+                # следующее чтение должно увидеть чужую запись
+                self._layout = None
+                raise
+
+    def _apply_trade(self, user_id, currency_code, delta, rate, balance, expected_version):
+        portfolio = self.get_portfolio(user_id)
+        if portfolio is None:
+            raise KeyError(f"Портфель пользователя {user_id} не найден.")
+        if not self._replays_journal:
+            # одна строка UPSERT вместо перезаписи всех портфелей
+            self.db.upsert_wallet(self.portfolios_file, user_id, currency_code, balance, expected_version)
+            current = portfolio.get("wallets", {}).get(currency_code, {}).get("version", 0)
+            version = (current if expected_version is None else expected_version) + 1
+            self.journal.append(user_id, currency_code, delta, rate, balance, version)
+            return
+        # get_portfolio под замком уже дочитал чужие записи журнала
+        version = portfolio.get("wallets", {}).get(currency_code, {}).get("version", 0)
+        if expected_version is not None and version != expected_version:
+            raise ConcurrentUpdateError(f"Кошелёк {currency_code} пользователя {user_id} "
+                                        f"уже изменён (версия {version}, ожидалась {expected_version})")
+        self.journal.append(user_id, currency_code, delta, rate, balance, version + 1)
+        self._replay_journal()
+        # в пакете снимок пишется только после fsync журнала, в commit()
+        if self._pending >= self.compact_every and not self._batching:
+            self.compact()
+
+    @contextmanager
+    def batch(self):
+        """Пакет сделок с групповой фиксацией: один fsync/COMMIT вместо одного на сделку"""
+        self._batching = True
+        self.journal.begin_group()
+        self.db.begin_batch()
+        try:
+            yield self
+        finally:
+            self._batching = False
+            self.journal.end_group()
+            self.db.end_batch()
+            self._compact_if_needed()
+
+    def commit(self) -> None:
+        """Делает durable всё, что записано в пакете к этому моменту"""
+        self.journal.sync()
+        self.db.commit_batch()
+        self._compact_if_needed()
+
+    def _compact_if_needed(self) -> None:
+        if self._replays_journal and self._pending >= self.compact_every:
+            self.compact()
+
+    def compact(self) -> None:
+        """Пишет снимок изменённых шардов и сдвигает контрольную точку журнала"""
+        if not self._replays_journal:
+            # в SQLite балансы уже лежат в таблице, полная перезапись затёрла бы чужие сделки
+            return
+        with self.db.lock("portfolios"):
+            self._compact()
+
+    def _compact(self) -> None:
+        # под замком дочитываем журнал и шарды: снимок другого процесса мог уйти дальше нашего
+        self._refresh_all()
+        # снимок не должен опережать журнал на диске (актуально в пакетном режиме)
+        self.journal.sync()
+        if self._layout[1] == 0 and self.shards > 1:
+            # первое сжатие с portfolio_shards > 1 раскладывает portfolios.json по шардам
+            self._write_layout(self.shards)
+            return
+        for shard in sorted(self._dirty):
+            self._ensure_shard(shard)
+            path = self._shard_file(shard)
+            self.db.save_json(path, list(self._shards[shard].values()))
+            self._shard_stamps[shard] = self.db.stamp(path)
+        # падение между снимком и контрольной точкой безопасно: повтор записей идемпотентен
+        self.journal.set_checkpoint(self._journal_offset)
+        self._dirty.clear()
+        self._pending = 0
+
+    def reshard(self, shards: int) -> tuple[int, int]:
+        """Перекладывает портфели в shards файлов без остановки других процессов.
+
+        Сделки в это время продолжают дописываться в журнал; процессы со старой
+        раскладкой заметят новый манифест и перечитают свои шарды.
+        """
+        if not self._replays_journal:
+            raise ValueError("Шардирование портфелей поддерживается только для storage_backend = \"json\"")
+        with self.db.lock("portfolios"):
+            self._reset_portfolios()
+            self.journal.sync()
+            return self._write_layout(shards)
+
+    def replace_portfolios(self, portfolios: list[dict]) -> None:
+        """Заменяет все портфели разом (генераторы данных и бенчмарки)"""
+        if not self._replays_journal:
+            self.db.save_json(self.portfolios_file, portfolios)
+            self._layout = None
+            return
+        with self.db.lock("portfolios"):
+            self.db.save_portfolio_layout(self.shards, portfolios)
+            # старые записи журнала не должны лечь поверх новых данных
+            self.journal.set_checkpoint(self.journal.size())
+            self._layout = None
+
+    def _write_layout(self, shards: int) -> tuple[int, int]:
+        for shard in range(self._layout[0]):
+            self._ensure_shard(shard)
+        portfolios = [record for records in self._shards.values() for record in records.values()]
+        layout = self.db.save_portfolio_layout(shards, portfolios)
+        self.journal.set_checkpoint(self._journal_offset)
+        self._dirty.clear()
+        self._pending = 0
+        # следующее обращение прочитает новую раскладку лениво, по шардам
+        self._layout = None
+        return layout
+
+    def _set_wallet(self, user_id: int, currency_code: str, balance: float, version: int = 0) -> None:
+        records = self._shards[self._shard(user_id)]
+        portfolio = records.get(user_id)
+        if portfolio is None:
+            portfolio = records[user_id] = {"user_id": user_id, "wallets": {}}
+        wallets = portfolio.setdefault("wallets", {})
+        wallets.setdefault(currency_code, {}).update(balance=balance, version=version)
@@ -0,0 +1,118 @@
+import gc
+import json
+
+# необязательные зависимости импортируются при первом обращении:
+# загрузка orjson одна заметно удлиняет холодный старт CLI
+_MISSING = object()
+orjson = _MISSING
+msgpack = _MISSING
+
+# первый байт JSON-документа; msgpack-документ (массив или словарь) с них не начинается
+JSON_START = frozenset(b"[{ \t\r\n")
+# с какого размера документа на время разбора отключается сборщик мусора
+GC_PAUSE_BYTES = 1 << 20
+
+
+def fast_json():
+    """Модуль orjson или None, если он не установлен"""
+    global orjson
+    if orjson is _MISSING:
+        try:
+            import orjson as module
+        except ImportError:  # без orjson работает стандартный json
+            module = None
+        orjson = module
+    return orjson
+
+
+def msgpack_module():
+    """Модуль msgpack или None, если он не установлен"""
+    global msgpack
+    if msgpack is _MISSING:
+        try:
+            import msgpack as module
+        except ImportError:
+            module = None
+        msgpack = module
+    return msgpack
+
+
+def json_loads(raw):
+    """Разбор JSON быстрым парсером, если он установлен"""
+    fast = fast_json()
+    if fast is not None:
+        return fast.loads(raw)
+    return json.loads(raw)
+
+
+class JsonSerializer:
+    """Читаемый JSON с отступами (формат по умолчанию)"""
+    name = "json"
+
+    def dumps(self, data) -> bytes:
+        return json.dumps(data, indent=4, ensure_ascii=False).encode("utf-8")
+
+    def loads(self, raw: bytes):
+        return json_loads(raw)
+
+
+class CompactJsonSerializer(JsonSerializer):
+    """JSON без пробелов; orjson, если установлен"""
+    name = "compact"
+
+    def dumps(self, data) -> bytes:
+        fast = fast_json()
+        if fast is not None:
+            return fast.dumps(data)
+        return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+class MsgpackSerializer:
+    """Двоичный msgpack (нужен пакет msgpack)"""
+    name = "msgpack"
+
+    def __init__(self):
+        if msgpack_module() is None:
+            raise ValueError("Формат msgpack требует пакет msgpack: pip install msgpack")
+
+    def dumps(self, data) -> bytes:
+        return msgpack.packb(data, use_bin_type=True)
+
+    def loads(self, raw: bytes):
+        return msgpack.unpackb(raw, raw=False, strict_map_key=False)
+
+
+SERIALIZERS = {cls.name: cls for cls in (JsonSerializer, CompactJsonSerializer, MsgpackSerializer)}
+_JSON = JsonSerializer()
+
+
+def get_serializer(name: str):
+    if name not in SERIALIZERS:
+        raise ValueError(f"Неизвестный формат данных '{name}'. Доступны: {', '.join(SERIALIZERS)}")
+    return SERIALIZERS[name]()
+
+
+def detect(raw: bytes):
+    """Сериализатор, которым записан raw: JSON (любой) или msgpack"""
+    if not raw or raw[0] in JSON_START:
+        return _JSON
+    if msgpack_module() is None:
+        # не ValueError: иначе файл сочли бы битым, и следующая запись затёрла бы данные
+        raise RuntimeError("Файл записан в формате msgpack, установите пакет msgpack")
+    return get_serializer("msgpack")
+
+
+def loads(raw: bytes):
+    """Разбирает файл любого поддерживаемого формата"""
+    if not raw:
+        return []
+    serializer = detect(raw)
+    if len(raw) < GC_PAUSE_BYTES or not gc.isenabled():
+        return serializer.loads(raw)
+    # разбор создаёт миллионы контейнеров, и циклический сборщик обходит их впустую:
+    # мусора в только что разобранном дереве нет, а время разбора растёт вдвое
+    gc.disable()
+    try:
+        return serializer.loads(raw)
+    finally:
+        gc.enable()
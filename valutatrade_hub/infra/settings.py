@@ -1,3 +1,4 @@
+import os
 import tomllib
 from pathlib import Path
 from typing import Any
@@ -30,14 +31,39 @@ class SettingsLoader:
 
         self._config.setdefault("data_path", "data")
         self._config.setdefault("rates_ttl_seconds", 300)
+        self._config.setdefault("rates_refresh_interval_seconds", 3600)
+        self._config.setdefault("refresh_intervals", {})
+        self._config.setdefault("adaptive_refresh", False)
         self._config.setdefault("default_base_currency", "USD")
+        self._config.setdefault("storage_backend", "json")
+        self._config.setdefault("sqlite_file", "valutatrade.db")
+        self._config.setdefault("data_format", "json")
+        self._config.setdefault("portfolio_shards", 1)
+        self._config.setdefault("journal_compact_every", 1000)
+        self._config.setdefault("journal_fsync", True)
+        self._config.setdefault("batch_commit_every", 100)
+        self._config.setdefault("batch_commit_seconds", 1.0)
+        self._config.setdefault("sqlite_busy_timeout_seconds", 10.0)
+        self._config.setdefault("lock_stripes", 64)
+        self._config.setdefault("server_host", "127.0.0.1")
+        self._config.setdefault("server_port", 8765)
 
-        self._config.setdefault("log_path", "logs/actions.log")
-        self._config.setdefault("parser_log_path", "data/parser.log")
+        self._config.setdefault("metrics_file", "")
 
-        self._config["data_path"] = self._project_root / self._config["data_path"]
-        self._config["log_path"] = self._project_root / self._config["log_path"]
-        self._config["parser_log_path"]=self._project_root / self._config["parser_log_path"]
+        self._config.setdefault("log_path", "actions.log")
+        self._config.setdefault("parser_log_path", "parser.log")
+        self._config.setdefault("log_max_bytes", 5 * 1024 * 1024)
+        self._config.setdefault("log_backup_count", 5)
+
+        # VALUTATRADE_DATA_PATH позволяет запускать бенчмарки на отдельном каталоге данных
+        data_path = os.getenv("VALUTATRADE_DATA_PATH", self._config["data_path"])
+        self._config["data_path"] = self._project_root / data_path
+        self._config["sqlite_file"] = self._config["data_path"] / self._config["sqlite_file"]
+        if self._config["metrics_file"]:
+            self._config["metrics_file"] = self._config["data_path"] / self._config["metrics_file"]
+        # логи лежат рядом с данными, поэтому VALUTATRADE_DATA_PATH уводит и их
+        self._config["log_path"] = self._config["data_path"] / self._config["log_path"]
+        self._config["parser_log_path"] = self._config["data_path"] / self._config["parser_log_path"]
     
     def get(self, key: str, default: Any = None) -> Any:
         return self._config.get(key, default)
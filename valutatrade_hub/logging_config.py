@@ -1,23 +1,145 @@
+import atexit
+import contextvars
+import json
 import logging
+import os
+import queue
+import threading
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, WatchedFileHandler
+
+from constants import ACTIONS_LOG, LOCKS_DIR, LOG_BACKUP_COUNT, LOG_MAX_BYTES, PARSER_LOG
+from infra.locks import FileLocks
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Одна JSON-строка на запись: время, логгер, уровень, сообщение и поля из extra={"fields": ...}"""
+    def format(self, record: logging.LogRecord) -> str:
+        row = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "logger": record.name,
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        row.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            row["exception"] = self.formatException(record.exc_info)
+        return json.dumps(row, ensure_ascii=False, default=str)
+
+
+# True в контексте фоновых задач (планировщик курсов): их записи идут только в файлы,
+# иначе "INFO: Обновляю курсы..." перебивает приглашение CLI
+background = contextvars.ContextVar("background", default=False)
+
+
+class ForegroundFilter(logging.Filter):
+    """Пропускает в консоль только записи, сделанные не из фоновой задачи"""
+    def filter(self, record: logging.LogRecord) -> bool:
+        return not background.get()
+
+
+class DeferredQueueHandler(QueueHandler):
+    """QueueHandler без форматирования в вызывающем потоке.
+
+    Стандартный prepare() форматирует и копирует запись ещё до постановки в очередь;
+    у нас сообщения — готовые строки, а поля — свежий словарь на каждый вызов,
+    так что всю работу можно оставить слушателю.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if _listener is None:
+            start_listener()
+        super().enqueue(record)
+
+
+class SharedRotatingFileHandler(WatchedFileHandler):
+    """Ротация по размеру для файла, в который пишут несколько процессов.
+
+    RotatingFileHandler переименовывает файл, ничего не зная о других процессах:
+    они продолжают писать в переименованный файл, а их следующая ротация затирает
+    свежий архив. Здесь файл открыт на дозапись (O_APPEND), поворачивает его один
+    процесс под flock, а остальные замечают новый файл (WatchedFileHandler) и
+    переоткрывают его при следующей записи.
+    """
+    def __init__(self, filename, max_bytes: int, backup_count: int, encoding=None):
+        # delay=True: файл открывается при первой записи, а не при импорте
+        super().__init__(filename, encoding=encoding, delay=True)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.locks = FileLocks(LOCKS_DIR, 1)
+
+    def _size(self) -> int:
+        try:
+            return os.stat(self.baseFilename).st_size
+        except FileNotFoundError:
+            return 0
+
+    def rollover_if_needed(self):
+        if self.max_bytes <= 0 or self.backup_count <= 0 or self._size() < self.max_bytes:
+            return
+        with self.locks.lock(os.path.basename(self.baseFilename)):
+            # пока ждали замок, файл мог повернуть другой процесс
+            if self._size() < self.max_bytes:
+                return
+            for i in range(self.backup_count - 1, 0, -1):
+                source = f"{self.baseFilename}.{i}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.baseFilename}.{i + 1}")
+            os.replace(self.baseFilename, f"{self.baseFilename}.1")
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            self.rollover_if_needed()
+        except OSError:
+            # не удалось повернуть (например, файл занят в Windows) — пишем дальше в текущий
+            pass
+        super().emit(record)
+
+
+def rotating_file(path, logger_name: str) -> SharedRotatingFileHandler:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    handler = SharedRotatingFileHandler(path, LOG_MAX_BYTES, LOG_BACKUP_COUNT, encoding="utf-8")
+    handler.setFormatter(JsonLinesFormatter())
+    # один поток-слушатель пишет оба файла, фильтр разводит записи по логгерам
+    handler.addFilter(logging.Filter(logger_name))
+    return handler
+
+
+# запись в файлы идёт в фоновом потоке: в горячем пути только постановка записи в очередь
+log_queue = queue.SimpleQueue()
+queue_handler = DeferredQueueHandler(log_queue)
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def start_listener() -> QueueListener:
+    """Поток записи логов в файлы; запускается при первой записи, а не при импорте"""
+    global _listener
+    with _listener_lock:
+        if _listener is None:
+            listener = QueueListener(log_queue, rotating_file(PARSER_LOG, "parser"),
+                                     rotating_file(ACTIONS_LOG, "actions"))
+            listener.start()
+            # при выходе дописываем всё, что осталось в очереди
+            atexit.register(listener.stop)
+            _listener = listener
+    return _listener
 
-from constants import ACTIONS_LOG, DATE_FORMAT, LOG_FORMAT, PARSER_LOG
 
 parser_logger = logging.getLogger("parser")
 parser_logger.setLevel(logging.INFO)
 parser_logger.handlers.clear()
 
+# консоль остаётся синхронной, чтобы сообщения не перемешивались с выводом команд
 console = logging.StreamHandler()
 console.setFormatter(logging.Formatter("INFO: %(message)s"))
+console.addFilter(ForegroundFilter())
 parser_logger.addHandler(console)
-
-parser_file = logging.FileHandler(PARSER_LOG, encoding="utf-8")
-parser_file.setFormatter(logging.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT[:-3]))
-parser_logger.addHandler(parser_file)
+parser_logger.addHandler(queue_handler)
 
 actions_logger = logging.getLogger("actions")
 actions_logger.setLevel(logging.INFO)
 actions_logger.handlers.clear()
-
-actions_file = logging.FileHandler(ACTIONS_LOG, encoding="utf-8")
-actions_file.setFormatter(logging.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT[:-3]))
-actions_logger.addHandler(actions_file)
\ No newline at end of file
+actions_logger.addHandler(queue_handler)
@@ -0,0 +1,88 @@
+import json
+import math
+import os
+import threading
+from datetime import datetime
+
+# ширина корзин гистограммы: соседние границы отличаются на 5%, это и есть точность перцентилей
+GROWTH = 1.05
+LOG_GROWTH = math.log(GROWTH)
+
+
+class LatencyHistogram:
+    """Гистограмма времени выполнения с логарифмическими корзинами.
+
+    Память не растёт с числом вызовов: хранится только счётчик на корзину.
+    """
+    def __init__(self):
+        self.buckets: dict[int, int] = {}
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float, ok: bool = True) -> None:
+        micros = max(seconds * 1e6, 1.0)
+        bucket = int(math.log(micros) / LOG_GROWTH)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        if not ok:
+            self.errors += 1
+
+    def percentile(self, q: float) -> float:
+        """Верхняя граница корзины, в которую попал q-й перцентиль (секунды)"""
+        if not self.count:
+            return 0.0
+        rank = math.ceil(q / 100 * self.count)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(GROWTH ** (bucket + 1) / 1e6, self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "mean_ms": round(self.total / self.count * 1e3, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(50) * 1e3, 3),
+            "p95_ms": round(self.percentile(95) * 1e3, 3),
+            "p99_ms": round(self.percentile(99) * 1e3, 3),
+            "max_ms": round(self.max * 1e3, 3),
+        }
+
+
+class LatencyMetrics:
+    """Гистограммы по действиям (BUY, SELL, ...) в памяти процесса"""
+    def __init__(self):
+        self._histograms: dict[str, LatencyHistogram] = {}
+        # команды CLI и фоновый планировщик пишут из разных потоков
+        self._lock = threading.Lock()
+
+    def record(self, action: str, seconds: float, ok: bool = True) -> None:
+        with self._lock:
+            histogram = self._histograms.get(action)
+            if histogram is None:
+                histogram = self._histograms[action] = LatencyHistogram()
+            histogram.record(seconds, ok)
+
+    def snapshot(self) -> dict[str, dict]:
+        with self._lock:
+            return {action: h.summary() for action, h in sorted(self._histograms.items())}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+    def flush(self, path) -> None:
+        """Дописывает снимок метрик одной JSON-строкой в файл path"""
+        row = {"timestamp": datetime.now().isoformat(timespec="seconds"),
+               "pid": os.getpid(), "actions": self.snapshot()}
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+latency_metrics = LatencyMetrics()
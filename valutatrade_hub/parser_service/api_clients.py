@@ -1,17 +1,112 @@
+import random
+import threading
+import time
 from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from typing import Dict
 
 import requests
 from core.exceptions import ApiRequestError
+from requests.adapters import HTTPAdapter
 
 from valutatrade_hub.logging_config import parser_logger
 
 from .config import ParserConfig
+from .rate_limiter import RateLimiter
 
 logger = parser_logger
 
 
+# временные ошибки, после которых запрос имеет смысл повторить
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Retry-After бывает числом секунд или HTTP-датой"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (moment - datetime.now(timezone.utc)).total_seconds())
+
+
 class BaseApiClient(ABC):
+    """Базовый клиент: общая пул-сессия с keep-alive, повторами с backoff и лимитом запросов"""
+    NAME = ""
+    _session = None
+    _limiter = None
+    _session_lock = threading.Lock()
+
+    def __init__(self, config: ParserConfig):
+        self.config = config
+
+    @classmethod
+    def get_session(cls, config: ParserConfig) -> requests.Session:
+        # одна сессия на процесс: соединения (TCP+TLS) переиспользуются между обновлениями
+        with cls._session_lock:
+            if BaseApiClient._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=config.HTTP_POOL_CONNECTIONS,
+                                      pool_maxsize=config.HTTP_POOL_MAXSIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                BaseApiClient._session = session
+            return BaseApiClient._session
+
+    @classmethod
+    def get_limiter(cls, config: ParserConfig) -> RateLimiter:
+        with cls._session_lock:
+            if BaseApiClient._limiter is None:
+                BaseApiClient._limiter = RateLimiter(config.RATE_LIMITS_FILE_PATH, config.RATE_LIMITS)
+            return BaseApiClient._limiter
+
+    def _backoff(self, attempt: int, retry_after: float | None) -> float:
+        # экспоненциальная задержка с полным jitter; Retry-After соблюдается целиком
+        delay = random.uniform(0, min(self.config.HTTP_BACKOFF_MAX,
+                                      self.config.HTTP_BACKOFF_BASE * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def _get(self, url: str, params: dict | None = None) -> requests.Response:
+        """GET через общую сессию; 429/5xx и сетевые сбои повторяются"""
+        session = self.get_session(self.config)
+        limiter = self.get_limiter(self.config)
+        retries = self.config.HTTP_RETRIES
+        # все попытки вместе с паузами укладываются в срок обновления
+        deadline = time.monotonic() + self.config.UPDATE_DEADLINE
+        for attempt in range(retries + 1):
+            # повторы тоже расходуют квоту, поэтому токен берётся на каждую попытку
+            if not limiter.acquire(self.NAME, self.config.RATE_LIMIT_MAX_WAIT):
+                raise ApiRequestError(f"{self.NAME}: локальный лимит запросов исчерпан, запрос пропущен")
+            try:
+                response = session.get(url, params=params, timeout=self.config.REQUEST_TIMEOUT)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                delay = self._backoff(attempt, None)
+                if attempt == retries or time.monotonic() + delay > deadline:
+                    raise
+                logger.warning(f"{type(self).__name__}: {e}, повтор через {delay:.1f} с")
+                time.sleep(delay)
+                continue
+            if response.status_code not in RETRY_STATUSES or attempt == retries:
+                return response
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            delay = self._backoff(attempt, retry_after)
+            if time.monotonic() + delay > deadline:
+                # сервер просит ждать дольше, чем осталось до срока обновления: отдаём ответ как есть
+                return response
+            logger.warning(f"{type(self).__name__}: HTTP {response.status_code}, "
+                           f"повтор через {delay:.1f} с")
+            time.sleep(delay)
+        return response
+
     @abstractmethod
     def fetch_rates(self) -> Dict[str, float]:
         pass
@@ -19,17 +114,13 @@ class BaseApiClient(ABC):
 
 class CoinGeckoClient(BaseApiClient):
     """API клиент для получения курса Крипты"""
-    def __init__(self, config: ParserConfig):
-        self.config = config
+    NAME = "CoinGecko"
 
     def fetch_rates(self) -> Dict[str, float]:
         ids = ",".join(self.config.CRYPTO_ID_MAP.values())
         params = {"ids": ids, "vs_currencies": self.config.BASE_CURRENCY.lower()}
         try:
-            response = requests.get(
-                self.config.COINGECKO_URL,
-                params=params,
-                timeout=self.config.REQUEST_TIMEOUT)
+            response = self._get(self.config.COINGECKO_URL, params=params)
             response.raise_for_status()
             data = response.json()
         except requests.exceptions.HTTPError as e:
@@ -46,6 +137,9 @@ class CoinGeckoClient(BaseApiClient):
                 msg = f"CoinGecko: Ошибка {status} — {text}"
             logger.error(msg)
             raise ApiRequestError(msg) from e
+        except ApiRequestError as e:
+            logger.error(str(e))
+            raise
         except Exception as e:
             msg = f"CoinGecko: Что-то пошло не так: {e}"
             logger.error(msg)
@@ -60,14 +154,13 @@ class CoinGeckoClient(BaseApiClient):
 
 class ExchangeRateApiClient(BaseApiClient):
     """API клиент для получения курса Фиата"""
-    def __init__(self, config: ParserConfig):
-        self.config = config
+    NAME = "ExchangeRate-API"
 
     def fetch_rates(self) -> Dict[str, float]:
         url = self.config.get_exchangerate_url()
 
         try:
-            response = requests.get(url, timeout=self.config.REQUEST_TIMEOUT)
+            response = self._get(url)
             response.raise_for_status()
             data = response.json()
         except requests.exceptions.HTTPError as e:
@@ -83,6 +176,9 @@ class ExchangeRateApiClient(BaseApiClient):
                 msg = f"ExchangeRate-API: Ошибка {status} — {text}"
             logger.error(msg)
             raise ApiRequestError(msg) from e
+        except ApiRequestError as e:
+            logger.error(str(e))
+            raise
         except Exception as e:
             msg = f"ExchangeRate-API: Неизвестная ошибка: {e}"
             logger.error(msg)
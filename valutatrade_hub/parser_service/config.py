@@ -1,18 +1,25 @@
+import os
+
 from constants import (
+    ADAPTIVE_REFRESH,
     DEFAULT_BASE_CURRENCY,
     EXCHANGE_RATE_FILE,
-    EXCHANGERATE_API_KEY,
+    HISTORY_DIR,
+    RATE_LIMITS_FILE,
     RATES_FILE,
+    RATES_REFRESH_INTERVAL,
+    REFRESH_INTERVALS,
 )
+from dotenv import load_dotenv
 
-if not EXCHANGERATE_API_KEY:
-    raise ValueError("EXCHANGERATE_API_KEY не найден в .env! Добавь: EXCHANGERATE_API_KEY=твой_ключ")
+# .env читается только парсером: остальным командам ключ API не нужен
+load_dotenv()
 
 
 class ParserConfig:
     """Настройки для парсера"""
     def __init__(self):
-        self.EXCHANGERATE_API_KEY = EXCHANGERATE_API_KEY
+        self.EXCHANGERATE_API_KEY = os.getenv("EXCHANGERATE_API_KEY")
         self.COINGECKO_URL = "https://api.coingecko.com/api/v3/simple/price"
         self.EXCHANGERATE_API_URL = "https://v6.exchangerate-api.com/v6"
         self.BASE_CURRENCY = DEFAULT_BASE_CURRENCY
@@ -24,7 +31,44 @@ class ParserConfig:
             "SOL": "solana"}
         self.RATES_FILE_PATH = RATES_FILE
         self.HISTORY_FILE_PATH = EXCHANGE_RATE_FILE
+        self.HISTORY_DIR_PATH = HISTORY_DIR
         self.REQUEST_TIMEOUT = 10
+        # общий срок на обновление из всех источников (они опрашиваются параллельно)
+        self.UPDATE_DEADLINE = 15
+        # период фонового обновления в RatesScheduler (секунды, 0 — выключено)
+        self.REFRESH_INTERVAL = RATES_REFRESH_INTERVAL
+        # какие валюты отдаёт каждый провайдер
+        self.PROVIDER_CURRENCIES = {
+            "CoinGecko": self.CRYPTO_CURRENCIES,
+            "ExchangeRate-API": self.FIAT_CURRENCIES}
+        # свой период для каждого провайдера; не указанные берут REFRESH_INTERVAL
+        self.REFRESH_INTERVALS = {name: REFRESH_INTERVALS.get(name, self.REFRESH_INTERVAL)
+                                  for name in self.PROVIDER_CURRENCIES}
+        # адаптивный режим: период сокращается при заметных изменениях курса и растёт в штиль
+        self.ADAPTIVE_REFRESH = ADAPTIVE_REFRESH
+        self.ADAPTIVE_LOW_CHANGE = 0.001   # < 0.1% за обновление — период удваивается
+        self.ADAPTIVE_HIGH_CHANGE = 0.01   # > 1% за обновление — период делится пополам
+        self.ADAPTIVE_MIN_FACTOR = 0.25    # границы периода относительно базового
+        self.ADAPTIVE_MAX_FACTOR = 8
+        self.ADAPTIVE_MIN_INTERVAL = 30
+        # сколько последних периодов истории смотреть при оценке изменений
+        self.ADAPTIVE_LOOKBACK = 5
+        # пул соединений общей HTTP-сессии и повторы при 429/5xx
+        self.HTTP_POOL_CONNECTIONS = 4
+        self.HTTP_POOL_MAXSIZE = 4
+        self.HTTP_RETRIES = 3
+        self.HTTP_BACKOFF_BASE = 0.5
+        self.HTTP_BACKOFF_MAX = 8.0
+        # клиентский token bucket: не больше capacity запросов за period секунд
+        self.RATE_LIMITS = {
+            "CoinGecko": {"capacity": 30, "period": 60},
+            "ExchangeRate-API": {"capacity": 1500, "period": 30 * 24 * 3600}}
+        self.RATE_LIMITS_FILE_PATH = RATE_LIMITS_FILE
+        # сколько секунд можно ждать токен, прежде чем пропустить запрос
+        self.RATE_LIMIT_MAX_WAIT = 5
 
     def get_exchangerate_url(self) -> str:
+        # без ключа падает только запрос к ExchangeRate-API, а не импорт модуля
+        if not self.EXCHANGERATE_API_KEY:
+            raise ValueError("EXCHANGERATE_API_KEY не найден в .env! Добавь: EXCHANGERATE_API_KEY=твой_ключ")
         return f"{self.EXCHANGERATE_API_URL}/{self.EXCHANGERATE_API_KEY}/latest/{self.BASE_CURRENCY}"
\ No newline at end of file
@@ -0,0 +1,77 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировка между процессами недоступна
+    fcntl = None
+
+
+class RateLimiter:
+    """Token bucket на каждого провайдера с состоянием в файле.
+
+    Состояние хранится в data/, поэтому лимит сохраняется между перезапусками
+    и делится между всеми процессами CLI/планировщика с одним API-ключом.
+    """
+    def __init__(self, state_path, limits: dict[str, dict]):
+        self.state_path = Path(state_path)
+        self.lock_path = self.state_path.with_name(self.state_path.name + ".lock")
+        self.limits = limits
+        self._thread_lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self):
+        with self._thread_lock, self.lock_path.open("a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load(self) -> dict:
+        try:
+            with self.state_path.open("r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, state: dict) -> None:
+        tmp = self.state_path.with_name(self.state_path.name + ".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.state_path)
+
+    def _try_take(self, provider: str) -> float:
+        """Берёт токен; возвращает 0 при успехе или сколько секунд ждать следующий"""
+        limit = self.limits[provider]
+        capacity = limit["capacity"]
+        refill = capacity / limit["period"]
+        with self._locked():
+            state = self._load()
+            now = time.time()
+            bucket = state.get(provider, {"tokens": capacity, "updated": now})
+            tokens = min(capacity, bucket["tokens"] + (now - bucket["updated"]) * refill)
+            if tokens >= 1:
+                state[provider] = {"tokens": tokens - 1, "updated": now}
+                self._save(state)
+                return 0.0
+            return (1 - tokens) / refill
+
+    def acquire(self, provider: str, max_wait: float = 0.0) -> bool:
+        """Ждёт токен не дольше max_wait секунд; False — запрос надо пропустить"""
+        if provider not in self.limits:
+            return True
+        deadline = time.monotonic() + max_wait
+        while True:
+            wait = self._try_take(provider)
+            if wait == 0:
+                return True
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
@@ -1,39 +1,122 @@
 import logging
+import threading
+from datetime import datetime, timedelta
 
 import schedule
 
+from valutatrade_hub.logging_config import background
+
 from .config import ParserConfig
-from .updater import RatesUpdater
+from .storage import max_relative_change
 
 logger = logging.getLogger("parser.scheduler")
 
 
 class RatesScheduler:
-    """Автоматическое обновление курса валют"""
-    def __init__(self):
-        self.config = ParserConfig()
-        self.updater = RatesUpdater(self.config)
-        self.running = False
+    """Автоматическое обновление курса валют в фоновом потоке.
+
+    У каждого провайдера своя задача со своим периодом (refresh_intervals
+    в [tool.valutatrade]). В адаптивном режиме период после каждого обновления
+    пересчитывается по изменениям курсов в сохранённой истории.
+    """
+    def __init__(self, config=None):
+        self.config = config or ParserConfig()
+        self._updater = None
+        # свой экземпляр вместо глобального schedule.default_scheduler
+        self.scheduler = schedule.Scheduler()
+        self.intervals: dict[str, float] = {}
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def updater(self):
+        # RatesUpdater (и requests) импортируется в фоновом потоке при первом обновлении
+        if self._updater is None:
+            from .updater import RatesUpdater
+            self._updater = RatesUpdater(self.config)
+        return self._updater
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _schedule(self, provider: str, interval: float):
+        self.intervals[provider] = interval
+        self.scheduler.every(interval).seconds.do(self._job, provider).tag(provider)
 
-    def _job(self):
+    def _job(self, provider: str):
         try:
-            logger.info("Запуск ежедневного обновления курсов...")
-            self.updater.run_update()
+            logger.info(f"Плановое обновление курсов: {provider}")
+            self.updater.run_update(provider)
         except Exception as e:
-            logger.error(f"Ошибка в планировщике: {e}")
+            logger.error(f"Ошибка в планировщике ({provider}): {e}")
+        if not self.config.ADAPTIVE_REFRESH:
+            return None
+        interval = self.intervals[provider]
+        new_interval = self._adapt(provider, interval)
+        if new_interval == interval:
+            return None
+        logger.info(f"{provider}: период обновления {interval:.0f} → {new_interval:.0f} с")
+        # schedule не умеет менять период задачи, поэтому ставим новую, а эту снимаем
+        self._schedule(provider, new_interval)
+        return schedule.CancelJob
 
-    def start(self):
-        if not self.running:
-            self.running = True
-            schedule.every().day.at("11:36").do(self._job)
-            # обновы работают следующим образом:
-            # ждёте назначенного времени или ставите сами, а потом в CLI нажмите Enter и всё обновится)))
+    def recent_change(self, provider: str, interval: float) -> float | None:
+        """Наибольшее изменение курсов провайдера за последние ADAPTIVE_LOOKBACK периодов"""
+        end = datetime.now()
+        start = end - timedelta(seconds=interval * self.config.ADAPTIVE_LOOKBACK)
+        changes = []
+        for code in self.config.PROVIDER_CURRENCIES[provider]:
+            points = self.updater.storage.history(f"{code}_{self.config.BASE_CURRENCY}", start, end)
+            change = max_relative_change(points)
+            if change is not None:
+                changes.append(change)
+        return max(changes) if changes else None
 
-    def stop(self):
-        if self.running:
-            self.running = False
-            schedule.clear()
+    def _adapt(self, provider: str, interval: float) -> float:
+        config = self.config
+        change = self.recent_change(provider, interval)
+        if change is None:
+            # истории пока мало — оставляем период как есть
+            return interval
+        base = config.REFRESH_INTERVALS[provider]
+        if change > config.ADAPTIVE_HIGH_CHANGE:
+            interval /= 2
+        elif change < config.ADAPTIVE_LOW_CHANGE:
+            interval *= 2
+        low = max(base * config.ADAPTIVE_MIN_FACTOR, config.ADAPTIVE_MIN_INTERVAL)
+        high = base * config.ADAPTIVE_MAX_FACTOR
+        return min(max(interval, min(low, base)), high)
+
+    def _loop(self):
+        # записи потока планировщика — только в parser.log, консоль остаётся за CLI
+        background.set(True)
+        while not self._stop_event.is_set():
+            self.scheduler.run_pending()
+            # спим до ближайшей задачи, но stop() будит поток сразу
+            self._stop_event.wait(self.scheduler.idle_seconds)
 
-    def run_once(self):
+    def start(self):
         if self.running:
-            schedule.run_pending()
\ No newline at end of file
+            return
+        self._stop_event.clear()
+        for provider, interval in self.config.REFRESH_INTERVALS.items():
+            if interval:
+                self._schedule(provider, interval)
+        if not self.scheduler.jobs:
+            logger.info("Автообновление курсов отключено (период 0)")
+            return
+        self._thread = threading.Thread(target=self._loop, name="rates-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float | None = None):
+        """Останавливает поток; идущее обновление дорабатывает не дольше UPDATE_DEADLINE"""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join(self.config.UPDATE_DEADLINE if timeout is None else timeout)
+        if self._thread.is_alive():
+            logger.error("Планировщик не остановился вовремя, поток будет брошен при выходе")
+        self._thread = None
+        self.scheduler.clear()
+        self.intervals.clear()
@@ -1,31 +1,189 @@
-import json
-import os
+import mmap
+import re
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from constants import HISTORY_DIR
+from infra.database import DatabaseManager, iter_lines, parse_json_line
 
 from valutatrade_hub.logging_config import parser_logger
 
 logger = parser_logger
 
+EPOCH = datetime(1970, 1, 1)
+# строки истории пишет dump_json_line, поэтому время в них всегда выглядит так
+TIMESTAMP_KEY = b'"timestamp":"'
+TIMESTAMP_RE = re.compile(rb'"timestamp":"([^"]*)"')
 
-class RatesStorage:
-    """Сохранение курса валют в файл"""
-    def __init__(self, rates_path, history_path):
-        self.rates_path = str(rates_path)
-        self.history_path = str(history_path)
 
-    def _load(self, path, default):
-        if not os.path.exists(path):
-            return default
+def line_timestamp(raw: bytes) -> bytes | None:
+    """Время записи прямо из байтов строки, без разбора JSON; None — формат неожиданный"""
+    start = raw.find(TIMESTAMP_KEY)
+    if start < 0:
+        return None
+    start += len(TIMESTAMP_KEY)
+    end = raw.find(b'"', start)
+    return raw[start:end] if end > 0 else None
+
+
+class RateHistoryStore:
+    """История курсов, разбитая по парам и месяцам: history/BTC_USD/2025-11.jsonl"""
+    def __init__(self, root, db: DatabaseManager):
+        self.root = Path(root)
+        self.db = db
+
+    def partition_path(self, pair: str, timestamp: str) -> Path:
+        # первые 7 символов ISO-времени — это месяц (YYYY-MM)
+        return self.root / pair / f"{timestamp[:7]}.jsonl"
+
+    def is_empty(self) -> bool:
+        return not self.root.exists() or not any(self.root.iterdir())
 
-        with open(path, "r", encoding="utf-8") as f:
-            content = f.read().strip()
-            if not content:     
-                return default 
+    def append(self, entries) -> int:
+        """Раскладывает записи по партициям: одна дозапись на партицию"""
+        # группируем по строковому ключу: Path на каждую запись заметно дороже
+        partitions: dict[tuple, list] = {}
+        for entry in entries:
+            key = (entry["from_currency"], entry["to_currency"], entry["timestamp"][:7])
+            partitions.setdefault(key, []).append(entry)
+        added = 0
+        for (from_c, to_c, month), rows in partitions.items():
+            path = self.partition_path(f"{from_c}_{to_c}", month)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            added += self.db.append_rows(path, rows, key="id")
+        return added
 
+    def _months(self, start: datetime, end: datetime):
+        year, month = start.year, start.month
+        while (year, month) <= (end.year, end.month):
+            yield f"{year:04d}-{month:02d}"
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+    def scan(self, pair: str, start: datetime, end: datetime):
+        """Записи пары за интервал по возрастанию времени, по одной.
+
+        Читаются только партиции нужных месяцев, а строки вне интервала
+        отсеиваются по байтам, без разбора JSON.
+        """
+        lo, hi = start.isoformat(timespec="seconds"), end.isoformat(timespec="seconds")
+        for month in self._months(start, end):
+            yield from self._scan_partition(self.root / pair / f"{month}.jsonl", lo, hi)
+
+    def _scan_partition(self, path: Path, lo: str, hi: str):
+        lo_bytes, hi_bytes = lo.encode(), hi.encode()
+        offset = self._window_offset(path, lo_bytes)
+        if offset is None:
+            # редкий случай: сортируем только строки интервала из этой партиции
+            rows = (parse_json_line(raw) for raw in iter_lines(path))
+            yield from sorted((r for r in rows if r and lo <= r["timestamp"] <= hi),
+                              key=lambda r: r["timestamp"])
+            return
+        for raw in iter_lines(path, offset):
+            stamp = line_timestamp(raw)
+            if stamp is None:
+                continue
+            if stamp > hi_bytes:
+                return
+            row = parse_json_line(raw)
+            if row is not None:
+                yield row
+
+    @staticmethod
+    def _window_offset(path: Path, lo: bytes) -> int | None:
+        """Смещение первой строки не раньше lo; None — партиция дописывалась не по порядку времени.
+
+        Один проход регулярным выражением по mmap, без разбора JSON.
+        """
         try:
-            return json.loads(content)
-        except Exception:
-            logger.warning(f"Файл {path} сломан, возвращаю пустой")
+            f = path.open("rb")
+        except FileNotFoundError:
+            return 0
+        with f:
+            if path.stat().st_size == 0:
+                return 0
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                previous, offset = b"", None
+                for match in TIMESTAMP_RE.finditer(mm):
+                    stamp = match.group(1)
+                    if stamp < previous:
+                        return None
+                    if offset is None and stamp >= lo:
+                        offset = mm.rfind(b"\n", 0, match.start()) + 1
+                    previous = stamp
+                return len(mm) if offset is None else offset
+
+
+def downsample(points, step_seconds: int):
+    """Сворачивает точки (по возрастанию времени) в OHLC-бары шириной step_seconds.
+
+    Генератор: бар отдаётся, как только начинается следующий, в памяти только текущий.
+    """
+    current = None
+    for point in points:
+        ts = datetime.fromisoformat(point["timestamp"])
+        bucket = int((ts - EPOCH).total_seconds()) // step_seconds * step_seconds
+        rate = point["rate"]
+        if current is None or current["bucket"] != bucket:
+            if current is not None:
+                yield _close_bar(current)
+            current = {"bucket": bucket, "open": rate, "high": rate,
+                       "low": rate, "close": rate, "count": 0}
+        current["high"] = max(current["high"], rate)
+        current["low"] = min(current["low"], rate)
+        current["close"] = rate
+        current["count"] += 1
+    if current is not None:
+        yield _close_bar(current)
+
+
+def _close_bar(bar: dict) -> dict:
+    bar["timestamp"] = (EPOCH + timedelta(seconds=bar.pop("bucket"))).isoformat()
+    return bar
+
+
+def max_relative_change(points) -> float | None:
+    """Наибольшее относительное изменение курса между соседними точками; None — точек меньше двух"""
+    change = None
+    prev = None
+    for point in points:
+        if prev is not None:
+            step = abs(point["rate"] / prev - 1) if prev else 0.0
+            change = step if change is None else max(change, step)
+        prev = point["rate"]
+    return change
+
+
+class RatesStorage:
+    """Сохранение курса валют через DatabaseManager (JSON-файлы или SQLite)
+
+    В JSON-режиме история хранится в RateHistoryStore (партиции по паре и месяцу),
+    в SQLite — в таблице rate_history с индексом по паре и времени.
+    """
+    def __init__(self, rates_path, history_path, history_dir=HISTORY_DIR):
+        self.rates_path = rates_path
+        self.history_path = history_path
+        self.db = DatabaseManager()
+        self.history_store = RateHistoryStore(history_dir, self.db)
+        self._migrate_legacy_history()
+
+    def _migrate_legacy_history(self):
+        """Разовый перенос плоской истории (exchange_rates.json/.jsonl) в партиции"""
+        if self.db.backend != "json" or not self.history_store.is_empty():
+            return
+        history = Path(self.history_path)
+        for legacy in (history, history.with_suffix(".json")):
+            if not legacy.exists():
+                continue
+            entries = self.db.load_json(legacy)
+            if entries:
+                added = self.history_store.append(entries)
+                logger.info(f"История курсов из {legacy.name} разложена по партициям: {added} записей")
+
+    def _load(self, path, default):
+        data = self.db.load_json(path)
+        if not data:
             return default
+        return data
 
     def save_rates(self, rates, last_time):
         data = {
@@ -34,23 +192,49 @@ class RatesStorage:
         }
         self._save(self.rates_path, data)
 
+    def merge_rates(self, rates, last_time):
+        """Дописывает свежие курсы к сохранённым; пары, которых нет в rates, остаются прежними.
+
+        Чтение и запись идут под блокировкой rates, иначе параллельное обновление
+        (планировщик и update-rates) затрёт курсы, полученные другим процессом.
+        """
+        with self.db.lock("rates"):
+            pairs = dict(self.get_rates().get("pairs", {}))
+            pairs.update(rates)
+            self.save_rates(pairs, last_time)
+    def save_history(self, entries) -> int:
+        """Дописывает пачку записей истории.
+
+        Записи с уже сохранённым id пропускаются; возвращает число новых.
+        """
+        if not entries:
+            return 0
+        if self.db.backend == "json":
+            return self.history_store.append(entries)
+        return self.db.append_rows(self.history_path, entries, key="id")
+
     def save_one_rate(self, rate_info):
-        history = self._load(self.history_path, [])
-        new_history = []
-        for h in history:
-            if h.get("id") != rate_info.get("id"):
-                new_history.append(h)
-        history = new_history
-        history.append(rate_info)
-        self._save(self.history_path, history)
+        self.save_history([rate_info])
+
+    def history(self, pair: str, start: datetime, end: datetime, resolution: int | None = None):
+        """Точки пары за [start, end] или OHLC-бары, если задан шаг resolution (секунды).
+
+        Возвращает генератор: история читается по мере обработки, а не целиком.
+        """
+        if self.db.backend == "json":
+            points = self.history_store.scan(pair, start, end)
+        else:
+            from_c, to_c = pair.split("_")
+            points = self.db.iter_history(self.history_path, from_c, to_c,
+                                          start.isoformat(timespec="seconds"),
+                                          end.isoformat(timespec="seconds"))
+        if resolution:
+            return downsample(points, resolution)
+        return points
 
     def _save(self, path, data):
-        tmp = path + ".tmp"
-        with open(tmp, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4)
-        if os.path.exists(path):
-            os.remove(path)
-        os.rename(tmp, path)
+        # атомарная запись (через .tmp) теперь делается в DatabaseManager
+        self.db.save_json(path, data)
 
     def get_rates(self):
-        return self._load(self.rates_path, {"pairs": {}, "last_refresh": "неизвестно"})
\ No newline at end of file
+        return self._load(self.rates_path, {"pairs": {}, "last_refresh": "неизвестно"})
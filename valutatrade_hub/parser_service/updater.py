@@ -1,3 +1,5 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
 
 from valutatrade_hub.logging_config import parser_logger
@@ -12,7 +14,8 @@ class RatesUpdater:
     """Обновление курса валют"""
     def __init__(self, config):
         self.config = config
-        self.storage = RatesStorage(config.RATES_FILE_PATH, config.HISTORY_FILE_PATH)
+        self.storage = RatesStorage(config.RATES_FILE_PATH, config.HISTORY_FILE_PATH,
+                                    config.HISTORY_DIR_PATH)
         self.coingecko = CoinGeckoClient(config)
         self.exchangerate = ExchangeRateApiClient(config)
 
@@ -20,6 +23,7 @@ class RatesUpdater:
         logger.info("Обновляю курсы...")
         now = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
         all_rates = {}
+        history = []
         if source:
             source = source.lower()
             if "coin" in source:
@@ -32,9 +36,22 @@ class RatesUpdater:
         else:
             clients = [("CoinGecko", self.coingecko), ("ExchangeRate-API", self.exchangerate)]
 
-        for name, client in clients:
+        # провайдеры опрашиваются параллельно: время обновления — максимум, а не сумма
+        deadline = self.config.UPDATE_DEADLINE
+        pool = ThreadPoolExecutor(max_workers=len(clients), thread_name_prefix="rates")
+        # потоки опроса наследуют контекст вызывающего (в том числе признак фоновой задачи)
+        futures = [(name, pool.submit(contextvars.copy_context().run, client.fetch_rates))
+                   for name, client in clients]
+        _, not_done = wait([future for _, future in futures], timeout=deadline)
+        # не ждём зависших провайдеров: их потоки доработают в фоне и будут проигнорированы
+        pool.shutdown(wait=False, cancel_futures=True)
+
+        for name, future in futures:
+            if future in not_done:
+                logger.error(f"{name}: не уложился в {deadline} с, курсы пропущены")
+                continue
             try:
-                rates = client.fetch_rates()
+                rates = future.result()
                 for pair, rate in rates.items():
                     from_c, to_c = pair.split("_")
                     rate_id = f"{from_c}_{to_c}_{now.replace(':', '').replace('-', '')}"
@@ -46,12 +63,16 @@ class RatesUpdater:
                         "timestamp": now,
                         "source": name
                     }
-                    self.storage.save_one_rate(entry)
+                    history.append(entry)
                     all_rates[pair] = {"rate": rate, "updated_at": now, "source": name}
                 logger.info(f"{name}: получено {len(rates)} курсов")
             except Exception as e:
                 logger.error(f"{name} упал: {e}")
+        if history:
+            # вся история обновления сохраняется одним вызовом
+            self.storage.save_history(history)
         if all_rates:
-            self.storage.save_rates(all_rates, now)
+            # при частичном результате курсы упавшего провайдера остаются прежними
+            self.storage.merge_rates(all_rates, now)
             logger.info(f"Сохранено {len(all_rates)} курсов")
         return len(all_rates)
\ No newline at end of file